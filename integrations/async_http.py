@@ -0,0 +1,58 @@
+"""
+Общая асинхронная HTTP-сессия для внешних интеграций.
+
+Все асинхронные клиенты (Spotify, Яндекс Музыка) используют одну
+aiohttp-сессию с пулом соединений, поэтому один event loop может
+опрашивать тысячи пользователей без создания нового TCP/TLS
+соединения на каждый запрос.
+
+Сессия привязана к event loop, в котором была создана,
+и должна закрываться через close_session() при остановке сервиса.
+"""
+import asyncio
+
+import aiohttp
+
+CONNECTIONS_LIMIT = 500
+CONNECTIONS_PER_HOST = 200
+DNS_CACHE_TTL = 300
+DEFAULT_TIMEOUT = 10
+
+_session: aiohttp.ClientSession | None = None
+_session_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Вернуть общую сессию, создав её при первом обращении.
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTIONS_LIMIT,
+            limit_per_host=CONNECTIONS_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+        )
+        _session_loop = loop
+
+    return _session
+
+
+async def close_session():
+    """
+    Закрыть общую сессию и освободить соединения пула.
+    """
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+    _session = None
+    _session_loop = None
@@ -0,0 +1,96 @@
+"""
+Общий HTTP-слой синхронных интеграций.
+
+Каждая интеграция получает собственную requests.Session с пулом
+keep-alive соединений на хост, таймаутами и политикой повторов,
+поэтому небольшие JSON-запросы не платят за новое TCP/TLS
+соединение при каждом вызове.
+"""
+import threading
+from typing import NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 50
+
+
+class HttpPolicy(NamedTuple):
+    """
+    Настройки запросов интеграции.
+
+    timeout — пара (connect, read) в секундах.
+    """
+    timeout: tuple[float, float]
+    retries: int
+    backoff_factor: float = 0.3
+    status_forcelist: tuple[int, ...] = (429, 500, 502, 503, 504)
+
+
+# Таймауты рассчитаны на веб-запросы: с повтором чтения ответ
+# не должен ждать дольше ~20 секунд
+POLICIES = {
+    "spotify": HttpPolicy(timeout=(3, 10), retries=2),
+    "yandex": HttpPolicy(timeout=(3, 10), retries=1),
+    "lyrics": HttpPolicy(timeout=(3, 5), retries=1),
+}
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def build_session(policy: HttpPolicy) -> requests.Session:
+    retry = Retry(
+        total=policy.retries,
+        connect=policy.retries,
+        read=policy.retries,
+        status=policy.retries,
+        backoff_factor=policy.backoff_factor,
+        status_forcelist=policy.status_forcelist,
+        # POST не повторяется: обмен кода авторизации OAuth одноразовый
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(integration: str) -> requests.Session:
+    """
+    Вернуть общую сессию интеграции, создав её при первом обращении.
+    """
+    session = _sessions.get(integration)
+    if session is not None:
+        return session
+
+    with _lock:
+        if integration not in _sessions:
+            _sessions[integration] = build_session(POLICIES[integration])
+        return _sessions[integration]
+
+
+def get_timeout(integration: str) -> tuple[float, float]:
+    return POLICIES[integration].timeout
+
+
+def request(integration: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Выполнить запрос через сессию интеграции с её таймаутом по умолчанию.
+    """
+    kwargs.setdefault("timeout", get_timeout(integration))
+    return get_session(integration).request(method, url, **kwargs)
+
+
+def get(integration: str, url: str, **kwargs) -> requests.Response:
+    return request(integration, "GET", url, **kwargs)
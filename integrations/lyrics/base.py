@@ -1,14 +1,31 @@
 from abc import ABC, abstractmethod
 
 
+class LyricsProviderError(Exception):
+    """
+    Провайдер недоступен или ответил ошибкой.
+
+    В отличие от None («текст не найден») означает,
+    что результат неизвестен и повторный запрос может быть успешным.
+    """
+
+
 class BaseLyricsClient(ABC):
     """
-    Абстрактный клиент получения текстов песен.
+    Абстрактный асинхронный клиент получения текстов песен.
+
+    name — идентификатор провайдера (совпадает с TrackLyrics.provider),
+    timeout — бюджет времени на один запрос в цепочке провайдеров.
     """
 
+    name: str
+    timeout: float = 5
+
     @abstractmethod
-    def get_lyrics(self, artist: str, title: str) -> str | None:
+    async def get_lyrics(self, artist: str, title: str) -> str | None:
         """
         Возвращает текст песни или None, если не найден.
+
+        :raises LyricsProviderError: при ошибке провайдера
         """
         raise NotImplementedError
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Параллельная цепочка провайдеров текстов песен.
+
+Первый провайдер запускается сразу, следующий — если предыдущий
+не ответил за hedge_delay секунд или ответил промахом/ошибкой.
+Возвращается первый найденный текст, остальные запросы отменяются,
+поэтому промах стоит время самого медленного провайдера, а не сумму.
+
+Каждый провайдер ограничен своим бюджетом времени и защищён
+автоматическим выключателем: после серии ошибок он пропускается,
+пока не пройдёт reset_timeout. Статистика задержек и попаданий
+собирается по каждому провайдеру.
+"""
+import asyncio
+import time
+from typing import NamedTuple
+
+from integrations.lyrics.base import BaseLyricsClient, LyricsProviderError
+
+HEDGE_DELAY = 0.5
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60
+
+
+class LyricsResult(NamedTuple):
+    provider: str
+    lyrics: str
+
+
+class CircuitBreaker:
+    """
+    Выключатель провайдера.
+
+    После failure_threshold ошибок подряд размыкается на reset_timeout
+    секунд, затем пропускает один пробный запрос: успех замыкает его,
+    ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # Пробный запрос отменён без результата
+        self.probing = False
+
+
+class ProviderStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+        self.latency_total = 0.0
+
+    def record(self, outcome: str, latency: float):
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        self.latency_total += latency
+
+    def as_dict(self) -> dict:
+        completed = self.hits + self.misses + self.errors
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / completed if completed else 0.0,
+            "avg_latency": self.latency_total / completed if completed else 0.0,
+        }
+
+
+class LyricsProviderChain:
+    """
+    Хеджированный опрос провайдеров с выключателями и статистикой.
+    """
+
+    def __init__(self, providers: list[BaseLyricsClient], hedge_delay: float = HEDGE_DELAY):
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+
+        self.breakers = {provider.name: CircuitBreaker() for provider in providers}
+        self.provider_stats = {provider.name: ProviderStats() for provider in providers}
+
+    async def get_lyrics(self, artist: str, title: str) -> LyricsResult | None:
+        """
+        :raises LyricsProviderError: если текст не найден и хотя бы
+            один провайдер ответил ошибкой или был пропущен
+        """
+        queue = iter(self.providers)
+        pending: set[asyncio.Task] = set()
+        unavailable = False
+
+        def launch_next() -> bool:
+            nonlocal unavailable
+
+            for provider in queue:
+                if self.breakers[provider.name].allow():
+                    pending.add(asyncio.create_task(self._call(provider, artist, title)))
+                    return True
+
+                self.provider_stats[provider.name].skipped += 1
+                unavailable = True
+
+            return False
+
+        launch_next()
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    # Текущие провайдеры медлят — подключаем следующий
+                    launch_next()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+
+                    try:
+                        result = task.result()
+                    except LyricsProviderError:
+                        unavailable = True
+                        result = None
+
+                    if result:
+                        return result
+
+                    launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if unavailable:
+            raise LyricsProviderError(f"No provider answered for {artist} — {title}")
+
+        return None
+
+    async def _call(self, provider: BaseLyricsClient, artist: str, title: str) -> LyricsResult | None:
+        breaker = self.breakers[provider.name]
+        stats = self.provider_stats[provider.name]
+        started = time.monotonic()
+
+        try:
+            lyrics = await asyncio.wait_for(
+                provider.get_lyrics(artist, title),
+                timeout=provider.timeout,
+            )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except (LyricsProviderError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            stats.record("errors", time.monotonic() - started)
+            raise LyricsProviderError(f"{provider.name}: {e!r}") from e
+
+        breaker.record_success()
+        stats.record("hits" if lyrics else "misses", time.monotonic() - started)
+
+        return LyricsResult(provider.name, lyrics) if lyrics else None
+
+    def stats(self) -> dict:
+        return {
+            name: {**stats.as_dict(), "state": self.breakers[name].state}
+            for name, stats in self.provider_stats.items()
+        }
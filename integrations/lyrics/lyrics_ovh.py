@@ -1,20 +1,37 @@
-import requests
+import asyncio
 from urllib.parse import quote
 
-from integrations.lyrics.base import BaseLyricsClient
+import aiohttp
+
+from integrations.async_http import get_session
+from integrations.http import get_timeout
+from integrations.lyrics.base import BaseLyricsClient, LyricsProviderError
 
 
 class LyricsOvhClient(BaseLyricsClient):
     BASE_URL = "https://api.lyrics.ovh/v1"
 
-    def get_lyrics(self, artist: str, title: str) -> str | None:
+    name = "lyrics_ovh"
+    timeout = sum(get_timeout("lyrics"))
+
+    async def get_lyrics(self, artist: str, title: str) -> str | None:
         url = f"{self.BASE_URL}/{quote(artist)}/{quote(title)}"
+        connect_timeout, read_timeout = get_timeout("lyrics")
 
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-        except requests.RequestException:
-            return None
+            async with get_session().get(
+                url,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=connect_timeout,
+                    sock_read=read_timeout,
+                ),
+            ) as response:
+                if response.status == 404:
+                    return None
+
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise LyricsProviderError(f"lyrics.ovh: {e!r}") from e
 
-        data = response.json()
         return data.get("lyrics")
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Объединение одновременных вызовов с одинаковым ключом.
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Асинхронный singleflight.
+
+    Пока корутина с ключом key выполняется, остальные вызовы с тем же
+    ключом не запускают fn повторно, а ждут и получают её результат
+    (или исключение). Отмена одного из ожидающих не отменяет общий вызов.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
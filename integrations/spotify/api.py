@@ -2,6 +2,64 @@ from typing import Optional
 
 import spotipy
 
+from integrations.http import get_session, get_timeout
+
+
+def parse_current_track(data: Optional[dict]) -> Optional[dict]:
+    """
+    Преобразовать ответ /me/player/currently-playing в словарь трека.
+
+    Используется и синхронным, и асинхронным клиентом,
+    чтобы оба возвращали данные в одном формате.
+    """
+    if not data or not data.get("item"):
+        return None
+
+    track = data["item"]
+
+    return {
+        "external_id": track["id"],
+        "title": track["name"],
+        "artist": ", ".join(
+            artist["name"] for artist in track["artists"]
+        ),
+        "track_url": track["external_urls"]["spotify"],
+        "cover_url": (
+            track["album"]["images"][0]["url"]
+            if track["album"]["images"]
+            else ""
+        ),
+        "duration_ms": track["duration_ms"],
+        "progress_ms": data.get("progress_ms"),
+        "is_playing": data.get("is_playing"),
+    }
+
+
+def parse_recently_played(response: Optional[dict]) -> list[dict]:
+    """
+    Преобразовать ответ /me/player/recently-played в список треков.
+    """
+    tracks = []
+    for item in (response or {}).get("items", []):
+        track = item.get("track")
+        if not track:
+            continue
+
+        tracks.append({
+            "external_id": track["id"],
+            "title": track["name"],
+            "artist": ", ".join(a["name"] for a in track["artists"]),
+            "track_url": track["external_urls"]["spotify"],
+            "cover_url": (
+                track["album"]["images"][0]["url"]
+                if track["album"]["images"] else ""
+            ),
+            "duration_ms": track["duration_ms"],
+            "played_at": item.get("played_at"),
+        })
+
+    return tracks
+
 
 class SpotifyMusicAPI:
     """
@@ -19,7 +77,11 @@ class SpotifyMusicAPI:
         """
         :param access_token: OAuth access token пользователя
         """
-        self.sp = spotipy.Spotify(auth=access_token)
+        self.sp = spotipy.Spotify(
+            auth=access_token,
+            requests_session=get_session("spotify"),
+            requests_timeout=get_timeout("spotify"),
+        )
 
     def get_current_track(self) -> Optional[dict]:
         """
@@ -28,49 +90,8 @@ class SpotifyMusicAPI:
         :return: dict с данными трека или None
         """
         data = self.sp.current_user_playing_track()
-
-        if not data or not data.get("item"):
-            return None
-
-        track = data["item"]
-
-        return {
-            "external_id": track["id"],
-            "title": track["name"],
-            "artist": ", ".join(
-                artist["name"] for artist in track["artists"]
-            ),
-            "track_url": track["external_urls"]["spotify"],
-            "cover_url": (
-                track["album"]["images"][0]["url"]
-                if track["album"]["images"]
-                else ""
-            ),
-            "duration_ms": track["duration_ms"],
-            "progress_ms": data.get("progress_ms"),
-            "is_playing": data.get("is_playing"),
-        }
+        return parse_current_track(data)
 
     def get_recently_played(self, limit: int = 50) -> list[dict]:
         response = self.sp.current_user_recently_played(limit=limit)
-
-        tracks = []
-        for item in response.get("items", []):
-            track = item.get("track")
-            if not track:
-                continue
-
-            tracks.append({
-                "external_id": track["id"],
-                "title": track["name"],
-                "artist": ", ".join(a["name"] for a in track["artists"]),
-                "track_url": track["external_urls"]["spotify"],
-                "cover_url": (
-                    track["album"]["images"][0]["url"]
-                    if track["album"]["images"] else ""
-                ),
-                "duration_ms": track["duration_ms"],
-                "played_at": item.get("played_at"),
-            })
-
-        return tracks
+        return parse_recently_played(response)
@@ -0,0 +1,144 @@
+from datetime import datetime
+from typing import Optional
+
+import aiohttp
+from spotipy import SpotifyException, SpotifyOauthError
+
+from MusicTrace import settings
+from integrations.async_http import get_session
+from integrations.spotify.api import parse_current_track, parse_recently_played
+
+
+MAX_PAGES = 5
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+async def _request_token(data: dict) -> dict:
+    session = get_session()
+
+    async with session.post(
+        TOKEN_URL,
+        data=data,
+        auth=aiohttp.BasicAuth(
+            settings.SPOTIFY_CLIENT_ID,
+            settings.SPOTIFY_CLIENT_SECRET,
+        ),
+    ) as response:
+        if response.status != 200:
+            raise SpotifyOauthError(
+                f"Token request failed: {response.status} {await response.text()}"
+            )
+
+        return await response.json()
+
+
+async def refresh_access_token(refresh_token: str) -> dict:
+    """
+    Обновить access token по refresh token.
+
+    :return: token_info в формате ответа Spotify (access_token, expires_in, ...)
+    """
+    return await _request_token({
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+    })
+
+
+async def request_access_token(code: str) -> dict:
+    """
+    Обменять код авторизации OAuth на access и refresh токены.
+
+    :return: token_info в формате ответа Spotify
+    """
+    return await _request_token({
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": settings.SPOTIFY_REDIRECT_URI,
+    })
+
+
+class AsyncSpotifyMusicAPI:
+    """
+    Асинхронный клиент Spotify Web API.
+
+    Выполняет те же запросы, что и SpotifyMusicAPI, но через общую
+    aiohttp-сессию, не блокируя event loop. Ответы преобразуются
+    теми же функциями, поэтому формат словарей треков совпадает.
+    """
+
+    BASE_URL = "https://api.spotify.com/v1"
+
+    def __init__(self, access_token: str):
+        """
+        :param access_token: OAuth access token пользователя
+        """
+        self.access_token = access_token
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> Optional[dict]:
+        return await self._get_url(f"{self.BASE_URL}{path}", params)
+
+    async def _get_url(self, url: str, params: Optional[dict] = None) -> Optional[dict]:
+        session = get_session()
+
+        async with session.get(
+            url,
+            params=params,
+            headers={"Authorization": f"Bearer {self.access_token}"},
+        ) as response:
+            if response.status == 204:
+                return None
+
+            if response.status >= 400:
+                raise SpotifyException(
+                    response.status,
+                    -1,
+                    f"{url}: {await response.text()}",
+                )
+
+            return await response.json()
+
+    async def get_current_track(self) -> Optional[dict]:
+        """
+        Получить трек, который воспроизводится в данный момент.
+
+        :return: dict с данными трека или None
+        """
+        data = await self._get("/me/player/currently-playing")
+        return parse_current_track(data)
+
+    async def get_recently_played(self, limit: int = 50) -> list[dict]:
+        response = await self._get(
+            "/me/player/recently-played",
+            params={"limit": limit},
+        )
+        return parse_recently_played(response)
+
+    async def get_recently_played_after(
+        self,
+        after: Optional[datetime],
+        limit: int = 50,
+        max_pages: int = MAX_PAGES,
+    ) -> list[dict]:
+        """
+        Получить только прослушивания, завершившиеся после курсора after.
+
+        Следует по ссылкам next, пока Spotify их возвращает.
+        Треки возвращаются в хронологическом порядке.
+
+        :param after: played_at последнего сохранённого прослушивания
+        """
+        params = {"limit": limit}
+        if after:
+            params["after"] = int(after.timestamp() * 1000)
+
+        response = await self._get("/me/player/recently-played", params=params)
+
+        tracks = parse_recently_played(response)
+        pages = 1
+
+        while response and response.get("next") and pages < max_pages:
+            response = await self._get_url(response["next"])
+            tracks.extend(parse_recently_played(response))
+            pages += 1
+
+        return sorted(tracks, key=lambda t: t["played_at"])
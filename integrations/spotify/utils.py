@@ -1,6 +1,8 @@
 from django.utils import timezone
 from spotipy import SpotifyOAuth
 from MusicTrace import settings
+from integrations.http import get_session, get_timeout
+from integrations.spotify.async_api import refresh_access_token
 
 
 def get_valid_spotify_token(service):
@@ -16,10 +18,24 @@ def get_valid_spotify_token(service):
         client_id=settings.SPOTIFY_CLIENT_ID,
         client_secret=settings.SPOTIFY_CLIENT_SECRET,
         redirect_uri=settings.SPOTIFY_REDIRECT_URI,
+        requests_session=get_session("spotify"),
+        requests_timeout=get_timeout("spotify"),
     )
 
     token_info = oauth.refresh_access_token(service.refresh_token)
+    apply_token_info(service, token_info)
 
+    service.save(update_fields=[
+        "access_token",
+        "refresh_token",
+        "expires_at",
+        "updated_at",
+    ])
+
+    return service.access_token
+
+
+def apply_token_info(service, token_info: dict):
     service.access_token = token_info["access_token"]
     service.expires_at = timezone.now() + timezone.timedelta(
         seconds=token_info["expires_in"]
@@ -28,10 +44,23 @@ def get_valid_spotify_token(service):
     if "refresh_token" in token_info:
         service.refresh_token = token_info["refresh_token"]
 
-    service.save(update_fields=[
+
+async def aget_valid_spotify_token(service):
+    """
+    Асинхронный вариант get_valid_spotify_token для async views.
+    """
+
+    if service.expires_at and service.expires_at > timezone.now():
+        return service.access_token
+
+    token_info = await refresh_access_token(service.refresh_token)
+    apply_token_info(service, token_info)
+
+    await service.asave(update_fields=[
         "access_token",
         "refresh_token",
         "expires_at",
+        "updated_at",
     ])
 
-    return service.access_token
\ No newline at end of file
+    return service.access_token
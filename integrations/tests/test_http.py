@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase
+
+from integrations.http import POLICIES, build_session
+
+
+class HttpPolicyTests(SimpleTestCase):
+    def test_post_is_not_retried(self):
+        for name, policy in POLICIES.items():
+            with self.subTest(integration=name):
+                retry = build_session(policy).get_adapter("https://").max_retries
+
+                self.assertTrue(retry.is_retry("GET", 503))
+                self.assertFalse(retry.is_retry("POST", 503))
+
+    def test_worst_case_read_wait_is_bounded(self):
+        for name, policy in POLICIES.items():
+            with self.subTest(integration=name):
+                connect, read = policy.timeout
+                self.assertLessEqual((connect + read) * (policy.retries + 1), 40)
@@ -0,0 +1,186 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from integrations.lyrics.base import BaseLyricsClient, LyricsProviderError
+from integrations.lyrics.chain import (
+    FAILURE_THRESHOLD,
+    RESET_TIMEOUT,
+    CircuitBreaker,
+    LyricsProviderChain,
+    LyricsResult,
+)
+
+
+class FakeProvider(BaseLyricsClient):
+    def __init__(self, name: str, result=None, delay: float = 0, timeout: float = 1):
+        self.name = name
+        self.result = result
+        self.delay = delay
+        self.timeout = timeout
+        self.calls = 0
+        self.cancelled = False
+
+    async def get_lyrics(self, artist: str, title: str) -> str | None:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("integrations.lyrics.chain.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+    def test_opens_after_threshold(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_allows_single_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.now += 60
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.now += 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_cancelled_probe_is_released(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.now += 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+
+
+class LyricsProviderChainTests(SimpleTestCase):
+    async def test_hedges_to_faster_provider(self):
+        slow = FakeProvider("slow", "slow text", delay=1)
+        fast = FakeProvider("fast", "fast text")
+        chain = LyricsProviderChain([slow, fast], hedge_delay=0.01)
+
+        result = await chain.get_lyrics("Artist", "Title")
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(result, LyricsResult("fast", "fast text"))
+        self.assertTrue(slow.cancelled)
+        self.assertEqual(chain.breakers["slow"].state, "closed")
+
+    async def test_error_falls_through_to_next_provider(self):
+        broken = FakeProvider("broken", LyricsProviderError("503"))
+        backup = FakeProvider("backup", "text")
+        chain = LyricsProviderChain([broken, backup], hedge_delay=1)
+
+        result = await chain.get_lyrics("Artist", "Title")
+
+        self.assertEqual(result, LyricsResult("backup", "text"))
+        self.assertEqual(chain.stats()["broken"]["errors"], 1)
+        self.assertEqual(chain.stats()["backup"]["hits"], 1)
+
+    async def test_timeout_counts_as_error(self):
+        stuck = FakeProvider("stuck", "text", delay=1, timeout=0.01)
+        chain = LyricsProviderChain([stuck], hedge_delay=1)
+
+        with self.assertRaises(LyricsProviderError):
+            await chain.get_lyrics("Artist", "Title")
+
+        self.assertEqual(chain.stats()["stuck"]["errors"], 1)
+
+    async def test_all_missing_returns_none(self):
+        chain = LyricsProviderChain([FakeProvider("a"), FakeProvider("b")], hedge_delay=1)
+
+        self.assertIsNone(await chain.get_lyrics("Artist", "Title"))
+        self.assertEqual(chain.stats()["a"]["misses"], 1)
+        self.assertEqual(chain.stats()["b"]["misses"], 1)
+
+    async def test_open_breaker_skips_provider(self):
+        broken = FakeProvider("broken", LyricsProviderError("503"))
+        backup = FakeProvider("backup")
+        chain = LyricsProviderChain([broken, backup], hedge_delay=1)
+
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(LyricsProviderError):
+                await chain.get_lyrics("Artist", "Title")
+
+        self.assertEqual(chain.breakers["broken"].state, "open")
+
+        # Пропуск провайдера — не промах: результат неизвестен
+        with self.assertRaises(LyricsProviderError):
+            await chain.get_lyrics("Artist", "Title")
+
+        self.assertEqual(broken.calls, FAILURE_THRESHOLD)
+        self.assertEqual(backup.calls, FAILURE_THRESHOLD + 1)
+
+        stats = chain.stats()["broken"]
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(stats["state"], "open")
+
+    async def test_half_open_probe_closes_breaker(self):
+        provider = FakeProvider("flaky", LyricsProviderError("503"))
+        chain = LyricsProviderChain([provider], hedge_delay=1)
+
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(LyricsProviderError):
+                await chain.get_lyrics("Artist", "Title")
+
+        provider.result = "text"
+        chain.breakers["flaky"].opened_at -= RESET_TIMEOUT
+        self.assertEqual(chain.breakers["flaky"].state, "half_open")
+
+        result = await chain.get_lyrics("Artist", "Title")
+
+        self.assertEqual(result, LyricsResult("flaky", "text"))
+        self.assertEqual(chain.breakers["flaky"].state, "closed")
+
+    async def test_stats(self):
+        chain = LyricsProviderChain([FakeProvider("a", "text")], hedge_delay=1)
+
+        await chain.get_lyrics("Artist", "Title")
+        await chain.get_lyrics("Artist", "Title")
+
+        stats = chain.stats()["a"]
+        self.assertEqual(
+            {key: stats[key] for key in ("hits", "misses", "errors", "skipped", "hit_rate", "state")},
+            {"hits": 2, "misses": 0, "errors": 0, "skipped": 0, "hit_rate": 1.0, "state": "closed"},
+        )
+        self.assertGreaterEqual(stats["avg_latency"], 0)
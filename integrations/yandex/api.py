@@ -1,9 +1,14 @@
-import requests
 from typing import List, Optional
 
 from yandex_music import Client
 from yandex_music.track import track as YandexTrack
 
+from integrations import http
+from integrations.yandex.tracks import track_cache, track_key
+
+NOW_PLAYING_URL = "http://track.mipoh.ru/get_current_track_beta"
+NOW_PLAYING_TIMEOUT = 30
+
 
 class YandexMusicAPI:
     """
@@ -29,10 +34,10 @@ class YandexMusicAPI:
 
         :return: объект yandex_music.track.Track или None
         """
-        response = requests.get(
-            "http://track.mipoh.ru/get_current_track_beta",
+        response = http.get(
+            "yandex",
+            NOW_PLAYING_URL,
             headers={"ya-token": self.token},
-            timeout=30
         )
 
         if response.status_code != 200:
@@ -44,10 +49,15 @@ class YandexMusicAPI:
         if not track_id:
             return None
 
+        cached = track_cache.get(track_key(track_id))
+        if cached:
+            return cached
+
         tracks = self.client.tracks(track_id)
         if not tracks:
             return None
 
+        track_cache.set(track_key(track_id), tracks[0])
         return tracks[0]
 
     def get_liked_tracks(self, limit: int = 100) -> List[YandexTrack]:
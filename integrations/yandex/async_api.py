@@ -0,0 +1,187 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+
+import aiohttp
+from yandex_music import Track as YandexTrack
+
+from integrations.async_http import get_session
+from integrations.yandex.api import NOW_PLAYING_URL, NOW_PLAYING_TIMEOUT
+from integrations.yandex.tracks import track_cache, track_key
+
+BATCH_WINDOW = 0.05
+MAX_BATCH_SIZE = 100
+
+
+class AsyncYandexMusicAPI:
+    """
+    Асинхронный клиент для получения текущего трека Яндекс Музыки.
+
+    В отличие от YandexMusicAPI не вызывает Client(token).init():
+    метаданные трека запрашиваются напрямую у API Яндекс Музыки
+    через общую aiohttp-сессию. Результат десериализуется в тот же
+    объект yandex_music.Track, что и в синхронном клиенте.
+    """
+
+    BASE_URL = "https://api.music.yandex.net"
+
+    def __init__(self, token: str):
+        self.token = token
+
+    async def get_current_track(self, timeout: float = NOW_PLAYING_TIMEOUT) -> Optional[YandexTrack]:
+        """
+        Получить трек, который воспроизводится в данный момент.
+
+        :param timeout: общий таймаут запроса; веб-запросы передают
+            меньшее значение, чем скробблер
+        :return: объект yandex_music.Track или None
+        """
+        session = get_session()
+
+        async with session.get(
+            NOW_PLAYING_URL,
+            headers={"ya-token": self.token},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            if response.status != 200:
+                return None
+
+            data = await response.json(content_type=None)
+
+        track_id = (data.get("track") or {}).get("track_id")
+        if not track_id:
+            return None
+
+        return await track_loader.load(track_id, self.token)
+
+    async def get_tracks(self, track_ids: list) -> list[YandexTrack]:
+        """
+        Получить метаданные треков по их идентификаторам.
+        """
+        session = get_session()
+
+        async with session.post(
+            f"{self.BASE_URL}/tracks",
+            data={
+                "track-ids": ",".join(str(i) for i in track_ids),
+                "with-positions": "True",
+            },
+            headers={"Authorization": f"OAuth {self.token}"},
+        ) as response:
+            if response.status != 200:
+                return []
+
+            data = await response.json(content_type=None)
+
+        return YandexTrack.de_list(data.get("result"), None)
+
+
+class PendingTrack:
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.tokens: set[str] = set()
+        self.tried: set[str] = set()
+        self.error: Exception | None = None
+
+    def untried(self) -> set[str]:
+        return self.tokens - self.tried
+
+
+class TrackBatchLoader:
+    """
+    Загрузчик метаданных треков с кэшем и объединением запросов.
+
+    Идентификаторы, запрошенные разными пользователями в пределах
+    BATCH_WINDOW секунд, загружаются одним запросом tracks([...]).
+    Повторные запросы одного трека ждут уже запущенную загрузку.
+
+    Запрос выполняется токеном, общим для наибольшего числа треков
+    пачки. Треки, которые этим токеном получить не удалось (истёкший
+    токен, трек доступен только владельцу), перезапрашиваются токенами
+    остальных пользователей, ожидающих этот трек.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW, max_batch_size: int = MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch_size = max_batch_size
+
+        self.pending: dict[str, PendingTrack] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def load(self, track_id, token: str) -> Optional[YandexTrack]:
+        key = track_key(track_id)
+
+        cached = track_cache.get(key)
+        if cached:
+            return cached
+
+        entry = self.pending.get(key)
+
+        if entry is None:
+            entry = PendingTrack(asyncio.get_running_loop().create_future())
+            self.pending[key] = entry
+
+        entry.tokens.add(token)
+
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+        return await asyncio.shield(entry.future)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        asyncio.create_task(self._fetch(batch))
+
+    async def _fetch(self, batch: dict[str, PendingTrack]):
+        remaining = dict(batch)
+
+        while remaining:
+            token = Counter(
+                token
+                for entry in remaining.values()
+                for token in entry.untried()
+            ).most_common(1)[0][0]
+
+            keys = [key for key, entry in remaining.items() if token in entry.untried()]
+
+            try:
+                tracks = await AsyncYandexMusicAPI(token).get_tracks(keys)
+            except Exception as e:
+                tracks = []
+                for key in keys:
+                    remaining[key].error = e
+
+            by_key = {track_key(track.id): track for track in tracks}
+
+            for key in keys:
+                entry = remaining[key]
+                entry.tried.add(token)
+                track = by_key.get(key)
+
+                if track:
+                    track_cache.set(key, track)
+                    self._resolve(remaining.pop(key), track)
+                elif not entry.untried():
+                    self._resolve(remaining.pop(key), None)
+
+    @staticmethod
+    def _resolve(entry: PendingTrack, track: YandexTrack | None):
+        if entry.future.done():
+            return
+
+        if track is None and entry.error is not None:
+            entry.future.set_exception(entry.error)
+        else:
+            entry.future.set_result(track)
+
+
+track_loader = TrackBatchLoader()
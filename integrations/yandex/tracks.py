@@ -0,0 +1,20 @@
+"""
+Кэш метаданных треков Яндекс Музыки.
+
+Метаданные трека не меняются между опросами, поэтому результат
+tracks() кэшируется по идентификатору трека и используется
+и синхронным, и асинхронным клиентом.
+"""
+from integrations.cache import TTLCache
+
+TRACK_CACHE_SIZE = 50_000
+TRACK_CACHE_TTL = 6 * 60 * 60
+
+track_cache = TTLCache(TRACK_CACHE_SIZE, TRACK_CACHE_TTL)
+
+
+def track_key(track_id) -> str:
+    """
+    Ключ кэша: идентификатор трека без идентификатора альбома.
+    """
+    return str(track_id).split(":")[0]
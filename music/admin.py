@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import UserMusicService, Track, UserTrackActivity
+from .services.search import filter_tracks
 
 # Сервисы
 admin.site.register(UserMusicService)
@@ -29,3 +30,11 @@ class TrackAdmin(admin.ModelAdmin):
     )
 
     ordering = ('service', 'genre', 'artist', 'title')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск через полнотекстовый индекс вместо LIKE по search_fields
+        if not search_term:
+            return queryset, False
+
+        return filter_tracks(queryset, search_term), False
+
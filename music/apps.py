@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MusicConfig(AppConfig):
     name = 'music'
+
+    def ready(self):
+        from music.services.search import create_search_index
+
+        post_migrate.connect(create_search_index, sender=self)
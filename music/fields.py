@@ -0,0 +1,58 @@
+"""
+Нестандартные поля моделей.
+"""
+import zlib
+
+from django.db import models
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress_text(value) -> str:
+    """
+    Распаковать значение из БД.
+
+    Строки, записанные до перехода на сжатие (текст или несжатые байты
+    после смены типа колонки), возвращаются как есть.
+    """
+    if isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    try:
+        return zlib.decompress(value).decode("utf-8")
+    except zlib.error:
+        return value.decode("utf-8")
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Текст, хранящийся в БД сжатым zlib.
+
+    В Python значение остаётся обычной строкой: сжатие происходит
+    при записи, распаковка — при чтении из БД.
+    """
+
+    description = "Text stored compressed with zlib"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            value = compress_text(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
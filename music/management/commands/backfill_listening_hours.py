@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from music.services.rollups import rebuild_listening_hours
+
+
+class Command(BaseCommand):
+    help = "Rebuild hourly listening rollups from track activity history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Rebuild only for this user id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_listening_hours(options["user_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Listening rollups rebuilt: {created} rows")
+        )
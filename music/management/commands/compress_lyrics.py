@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from music.models import TrackLyrics
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Rewrite stored lyrics in compressed form after switching the column to binary"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Rows per UPDATE batch",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        converted = 0
+        last_pk = 0
+
+        while True:
+            # Поле читает и несжатые строки, поэтому повторный запуск безопасен
+            rows = list(
+                TrackLyrics.objects
+                .filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "lyrics")[:batch_size]
+            )
+            if not rows:
+                break
+
+            with transaction.atomic():
+                TrackLyrics.objects.bulk_update(
+                    [TrackLyrics(pk=pk, lyrics=lyrics) for pk, lyrics in rows],
+                    ["lyrics"],
+                )
+
+            converted += len(rows)
+            last_pk = rows[-1][0]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Lyrics compressed: {converted} rows")
+        )
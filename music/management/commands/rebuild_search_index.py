@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from music.services.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over tracks and stored lyrics"
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(f"Search index rebuilt: {indexed} tracks")
+        )
@@ -5,11 +5,18 @@
 - UserMusicService — подключённые музыкальные сервисы пользователя
 - Track — универсальное представление музыкального трека
 - UserTrackActivity — история музыкальной активности пользователей
+- UserListeningHour — почасовые агрегаты прослушиваний для графиков активности
+- UserArtistCounter / UserGenreCounter — счётчики артистов и жанров пользователя
+- UserDataVersion — версия данных статистики пользователя
+- NowPlayingSnapshot — последний опрос «сейчас играет» от скробблера
 - TrackLyricsStats — статистика просмотров текстов песен
 - TrackLyrics — сохранённые тексты популярных треков
 """
-from django.db import models
 from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+from music.fields import CompressedTextField
 
 
 class UserMusicService(models.Model):
@@ -44,7 +51,7 @@ class UserMusicService(models.Model):
     expires_at = models.DateTimeField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('user', 'service')
@@ -135,6 +142,152 @@ class UserTrackActivity(models.Model):
         return f"{self.user.username} → {self.track}"
 
 
+class UserListeningHour(models.Model):
+    """
+    Количество прослушиваний пользователя в сервисе за час.
+
+    Материализованный агрегат UserTrackActivity: обновляется при записи
+    скробблов и используется графиками активности вместо сканирования
+    всей истории. Час хранится как начало часа в UTC.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='listening_hours'
+    )
+
+    service = models.CharField(
+        max_length=20,
+        choices=Track.SERVICE_CHOICES
+    )
+
+    hour = models.DateTimeField()
+    play_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'service', 'hour')
+
+    def __str__(self):
+        return f"{self.user.username} — {self.service} {self.hour}: {self.play_count}"
+
+
+class UserCounter(models.Model):
+    """
+    Базовый счётчик прослушиваний пользователя по значению атрибута трека.
+
+    track_count — число различных треков, play_count — число прослушиваний.
+    Обновляется при записи скробблов, чтобы статистика дашборда
+    не зависела от объёма истории.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    service = models.CharField(
+        max_length=20,
+        choices=Track.SERVICE_CHOICES
+    )
+
+    track_count = models.PositiveIntegerField(default=0)
+    play_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class UserArtistCounter(UserCounter):
+    """
+    Счётчик прослушиваний артиста пользователем в сервисе.
+    """
+
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = ('user', 'service', 'name')
+        indexes = [
+            models.Index(fields=['user', 'service', '-track_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} — {self.name}: {self.track_count}"
+
+
+class UserGenreCounter(UserCounter):
+    """
+    Счётчик прослушиваний жанра пользователем в сервисе.
+    """
+
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('user', 'service', 'name')
+        indexes = [
+            models.Index(fields=['user', 'service', '-track_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} — {self.name}: {self.track_count}"
+
+
+class UserDataVersion(models.Model):
+    """
+    Версия данных статистики пользователя.
+
+    Обновляется при каждой записи прослушиваний и используется
+    как часть ключа кэша ответов /api/stats/* и их ETag.
+    Хранится в БД, так как скробблер и веб-сервер — разные процессы.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='data_version'
+    )
+
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username}: {self.updated_at}"
+
+
+class NowPlayingSnapshot(models.Model):
+    """
+    Последнее известное состояние «сейчас играет» пользователя в сервисе.
+
+    Публикуется скробблером после каждого опроса, чтобы веб-запросы
+    отдавали готовый ответ, не обращаясь к API сервиса.
+    payload хранится в формате ответа /api/now-playing/.
+
+    valid_until — момент следующего опроса пользователя скробблером
+    (с запасом): до него снимок считается актуальным.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='now_playing'
+    )
+
+    service = models.CharField(
+        max_length=20,
+        choices=UserMusicService.SERVICE_CHOICES
+    )
+
+    payload = models.JSONField()
+    updated_at = models.DateTimeField()
+    valid_until = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'service')
+
+    def __str__(self):
+        return f"{self.user.username} — {self.service}: {self.payload.get('status')}"
+
+
 class TrackLyricsStats(models.Model):
     """
     Статистика просмотров текстов песен.
@@ -159,6 +312,23 @@ class TrackLyricsStats(models.Model):
         return f"Lyrics views: {self.track} — {self.views}"
 
 
+class TrackLyricsManager(models.Manager):
+    """
+    Менеджер текстов песен, не загружающий сам текст без явного запроса.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer("lyrics")
+
+    async def get_text(self, track_id: int) -> str | None:
+        return await (
+            self.get_queryset()
+            .filter(track_id=track_id)
+            .values_list("lyrics", flat=True)
+            .afirst()
+        )
+
+
 class TrackLyrics(models.Model):
     """
     Сохранённый текст песни.
@@ -170,6 +340,10 @@ class TrackLyrics(models.Model):
     - снижения количества внешних API-запросов
     - ускорения отображения текста
     - экономии лимитов сторонних сервисов
+
+    Текст хранится сжатым и по умолчанию не загружается:
+    objects откладывает поле lyrics, а сам текст читается
+    явно через TrackLyrics.objects.get_text(track_id).
     """
 
     PROVIDER_CHOICES = (
@@ -183,10 +357,12 @@ class TrackLyrics(models.Model):
         related_name='lyrics'
     )
 
-    lyrics = models.TextField()
+    lyrics = CompressedTextField()
     provider = models.CharField(max_length=50, choices=PROVIDER_CHOICES)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TrackLyricsManager()
+
     def __str__(self):
         return f"Lyrics: {self.track}"
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Сборка данных дашборда.
+
+Функции возвращают те же словари, что и отдельные /api/* endpoint'ы,
+и используются как ими, так и объединённым /api/dashboard/,
+который отдаёт всё состояние дашборда одним ответом.
+Подключённые сервисы загружаются одним запросом и переиспользуются
+для определения источника по умолчанию и now playing.
+"""
+from django.db.models import Sum
+from django.utils import timezone
+
+from music.models import (
+    UserArtistCounter,
+    UserGenreCounter,
+    UserMusicService,
+    UserTrackActivity,
+)
+from music.services.timeseries import activity_histogram
+
+SOURCE_PRIORITY = ("yandex", "spotify")
+RECENT_LIMIT = 20
+
+
+def get_user_services(user) -> dict[str, UserMusicService]:
+    return {
+        service.service: service
+        for service in UserMusicService.objects.filter(user=user)
+    }
+
+
+def get_default_source(services) -> str | None:
+    for source in SOURCE_PRIORITY:
+        if source in services:
+            return source
+    return None
+
+
+def build_services(services: dict[str, UserMusicService]) -> dict:
+    return {
+        "services": list(services),
+        "default": get_default_source(services),
+    }
+
+
+def get_total_tracks(user, source) -> int:
+    return (
+        UserArtistCounter.objects
+        .filter(user=user, service=source)
+        .aggregate(total=Sum("track_count"))["total"]
+        or 0
+    )
+
+
+def build_summary(user, source) -> dict:
+    top_genre = (
+        UserGenreCounter.objects
+        .filter(user=user, service=source)
+        .order_by("-track_count")
+        .values("name", "track_count")
+        .first()
+    )
+
+    top_artist = (
+        UserArtistCounter.objects
+        .filter(user=user, service=source)
+        .order_by("-track_count")
+        .values("name", "track_count")
+        .first()
+    )
+
+    total = get_total_tracks(user, source) or 1
+
+    return {
+        "top_genre": {
+            "name": top_genre["name"] if top_genre else "—",
+            "percent": int(top_genre["track_count"] / total * 100) if top_genre else 0,
+        },
+        "top_artist": {
+            "name": top_artist["name"] if top_artist else "—",
+            "percent": int(top_artist["track_count"] / total * 100) if top_artist else 0,
+        }
+    }
+
+
+def build_recent(user, source, limit: int = RECENT_LIMIT) -> dict:
+    qs = (
+        UserTrackActivity.objects
+        .filter(user=user, track__service=source)
+        .select_related("track")
+        .order_by("-played_at")[:limit]
+    )
+
+    return {
+        "tracks": [{
+            "title": a.track.title,
+            "artist": a.track.artist,
+            "cover": a.track.cover_url,
+        } for a in qs]
+    }
+
+
+def build_activity(user, source, period, tz) -> dict:
+    return {"data": activity_histogram(user, source, period, timezone.now(), tz)}
+
+
+def build_stats(user, source, period, tz) -> dict:
+    """
+    Статистика дашборда по источнику: сводка, история и активность.
+    """
+    return {
+        "summary": build_summary(user, source),
+        "recent": build_recent(user, source),
+        "activity": build_activity(user, source, period, tz),
+    }
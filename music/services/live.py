@@ -0,0 +1,210 @@
+"""
+Живые обновления дашборда для Server-Sent Events.
+
+Скробблер и веб-сервер — разные процессы, поэтому изменения
+приходят через БД: NowPlayingSnapshot и UserDataVersion.
+LiveHub одного ASGI-процесса опрашивает их раз в POLL_INTERVAL
+секунд сразу для всех подключённых пользователей и раздаёт
+изменения по очередям подписчиков, так что число запросов
+к БД не зависит от количества открытых вкладок.
+
+События:
+- now_playing — новый снимок «сейчас играет» с временными метками
+  для экстраполяции прогресса на клиенте
+- scrobble — новое сохранённое прослушивание
+"""
+import asyncio
+import logging
+import time
+
+from music.models import NowPlayingSnapshot, UserDataVersion, UserTrackActivity
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1
+QUEUE_SIZE = 100
+MAX_SCROBBLES_PER_POLL = 50
+
+
+def to_ms(value) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def with_server_time(event: dict) -> dict:
+    """
+    Событие now_playing с текущим временем сервера и прогрессом на этот момент.
+    """
+    server_time = now_ms()
+    started_at = event.get("started_at")
+
+    return {
+        **event,
+        "server_time": server_time,
+        "progress_ms": server_time - started_at if started_at is not None else None,
+    }
+
+
+class LiveHub:
+    """
+    Рассылка изменений подписчикам одного процесса.
+
+    Фоновый опрос запускается с первой подпиской и завершается,
+    когда подписчиков не остаётся.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+
+        self.subscribers: dict[int, set[asyncio.Queue]] = {}
+
+        # Последнее отправленное состояние пользователей
+        self.now_playing: dict[tuple[int, str], dict] = {}
+        self.started_at: dict[tuple[int, str], tuple[str, int]] = {}
+        self.versions: dict[int, object] = {}
+        self.last_activity_ids: dict[int, int] = {}
+
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+
+        for (snapshot_user_id, _), event in self.now_playing.items():
+            if snapshot_user_id == user_id:
+                queue.put_nowait(("now_playing", with_server_time(event)))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self.subscribers.get(user_id)
+        if queues is None:
+            return
+
+        queues.discard(queue)
+        if queues:
+            return
+
+        del self.subscribers[user_id]
+        self.versions.pop(user_id, None)
+        self.last_activity_ids.pop(user_id, None)
+
+        for key in [key for key in self.now_playing if key[0] == user_id]:
+            self.now_playing.pop(key)
+            self.started_at.pop(key, None)
+
+    def send(self, user_id: int, event: str, data: dict):
+        for queue in self.subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                logger.debug(f"Live queue full user_id={user_id} event={event}")
+
+    async def run(self):
+        while self.subscribers:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Live poll failed")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self):
+        user_ids = list(self.subscribers)
+
+        for user_id in user_ids:
+            if user_id not in self.last_activity_ids:
+                # Новый подписчик: рассылаем только прослушивания после подключения
+                self.last_activity_ids[user_id] = await (
+                    UserTrackActivity.objects
+                    .filter(user_id=user_id)
+                    .order_by("-id")
+                    .values_list("id", flat=True)
+                    .afirst()
+                ) or 0
+
+        async for snapshot in NowPlayingSnapshot.objects.filter(user_id__in=user_ids):
+            self.update_now_playing(snapshot)
+
+        changed = []
+        async for user_id, version in (
+            UserDataVersion.objects
+            .filter(user_id__in=user_ids)
+            .values_list("user_id", "updated_at")
+        ):
+            if self.versions.get(user_id) != version:
+                self.versions[user_id] = version
+                changed.append(user_id)
+
+        for user_id in changed:
+            await self.send_scrobbles(user_id)
+
+    def update_now_playing(self, snapshot: NowPlayingSnapshot):
+        key = (snapshot.user_id, snapshot.service)
+        updated_at = to_ms(snapshot.updated_at)
+
+        previous = self.now_playing.get(key)
+        if previous and previous["updated_at"] == updated_at:
+            return
+
+        payload = snapshot.payload
+        track = payload.get("track") or {}
+
+        if track.get("progress_ms") is not None:
+            started_at = updated_at - track["progress_ms"]
+        else:
+            # Сервис не сообщает позицию: отсчитываем от первого снимка трека
+            external_id, started_at = self.started_at.get(key, (None, updated_at))
+            if external_id != track.get("external_id"):
+                started_at = updated_at
+
+        self.started_at[key] = (track.get("external_id"), started_at)
+
+        event = with_server_time({
+            **payload,
+            "updated_at": updated_at,
+            "started_at": started_at if track else None,
+        })
+
+        self.now_playing[key] = event
+        self.send(snapshot.user_id, "now_playing", event)
+
+    async def send_scrobbles(self, user_id: int):
+        last_id = self.last_activity_ids[user_id]
+
+        activities = [
+            activity
+            async for activity in (
+                UserTrackActivity.objects
+                .filter(user_id=user_id, id__gt=last_id)
+                .select_related("track")
+                .order_by("id")[:MAX_SCROBBLES_PER_POLL]
+            )
+        ]
+
+        if not activities:
+            return
+
+        self.last_activity_ids[user_id] = activities[-1].id
+        server_time = now_ms()
+
+        for activity in activities:
+            self.send(user_id, "scrobble", {
+                "source": activity.track.service,
+                "played_at": to_ms(activity.played_at),
+                "server_time": server_time,
+                "track": {
+                    "title": activity.track.title,
+                    "artist": activity.track.artist,
+                    "cover": activity.track.cover_url,
+                },
+            })
+
+
+live_hub = LiveHub()
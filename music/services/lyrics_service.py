@@ -1,8 +1,30 @@
-from django.db import transaction
-from django.utils import timezone
+import hashlib
+import logging
 
-from music.models import Track, TrackLyrics, TrackLyricsStats
+from django.core.cache import cache
+
+from music.models import Track, TrackLyrics
+from integrations.lyrics.base import LyricsProviderError
+from integrations.lyrics.chain import LyricsProviderChain, LyricsResult
 from integrations.lyrics.lyrics_ovh import LyricsOvhClient
+from integrations.singleflight import SingleFlight
+from music.services.lyrics_views import lyrics_views
+from music.services.search import index_tracks_async
+
+logger = logging.getLogger(__name__)
+
+lyrics_fetches = SingleFlight()
+
+# Общая на процесс цепочка: выключатели и статистика провайдеров
+# должны переживать отдельные экземпляры LyricsService
+lyrics_providers = LyricsProviderChain([
+    LyricsOvhClient(),
+])
+
+
+def lyrics_cache_key(artist: str, title: str) -> str:
+    raw = f"{artist.strip().casefold()}|{title.strip().casefold()}"
+    return f"lyrics:v2:{hashlib.md5(raw.encode()).hexdigest()}"
 
 
 class LyricsService:
@@ -10,53 +32,91 @@ class LyricsService:
     Сервис получения и сохранения текстов песен.
 
     Правила:
-    - текст сохраняется только после N просмотров
-    - используется цепочка провайдеров
+    - текст сохраняется только после N просмотров; просмотры считаются
+      буферизованным счётчиком lyrics_views без блокировок строк
+    - провайдеры опрашиваются хеджированной цепочкой lyrics_providers
+    - одновременные запросы одного (artist, title) объединяются
+    - несохранённый текст кэшируется на CACHE_TTL, «не найден» — на NOT_FOUND_TTL,
+      поэтому к провайдерам уходит не больше одного запроса на трек за TTL
+    - ошибки провайдеров не кэшируются
     """
 
     SAVE_THRESHOLD = 3
+    CACHE_TTL = 30 * 60
+    NOT_FOUND_TTL = 6 * 60 * 60
 
     def __init__(self):
-        self.providers = [
-            LyricsOvhClient(),
-        ]
+        self.providers = lyrics_providers
 
-    def get_lyrics(self, track: Track) -> str | None:
-        stored = getattr(track, "lyrics", None)
+    async def get_lyrics(self, track: Track) -> str | None:
+        stored = await TrackLyrics.objects.get_text(track.id)
         if stored:
-            self._inc_views(track)
-            return stored.lyrics
+            await lyrics_views.add(track.id)
+            return stored
 
-        lyrics = self._fetch_external(track.artist, track.title)
-        if not lyrics:
+        result = await self._get_external(track.artist, track.title)
+        if not result:
             return None
 
-        stats = self._inc_views(track)
-
-        if stats.views >= self.SAVE_THRESHOLD:
-            TrackLyrics.objects.get_or_create(
-                track=track,
-                defaults={
-                    "lyrics": lyrics,
-                    "provider": "musixmatch",
-                }
-            )
-
-        return lyrics
-
-    def _fetch_external(self, artist: str, title: str) -> str | None:
-        for provider in self.providers:
-            lyrics = provider.get_lyrics(artist, title)
-            if lyrics:
-                return lyrics
-        return None
-
-    @transaction.atomic
-    def _inc_views(self, track: Track) -> TrackLyricsStats:
-        stats, _ = TrackLyricsStats.objects.select_for_update().get_or_create(
-            track=track
+        views = await lyrics_views.add(track.id)
+
+        if views >= self.SAVE_THRESHOLD:
+            await self._store(track, result)
+
+        return result.lyrics
+
+    async def prefetch(self, track: Track) -> bool:
+        """
+        Загрузить и сохранить текст популярного трека заранее,
+        без учёта просмотра и порога SAVE_THRESHOLD.
+
+        :return: True, если текст сохранён
+        """
+        if await TrackLyrics.objects.filter(track=track).aexists():
+            return True
+
+        result = await self._get_external(track.artist, track.title)
+        if not result:
+            return False
+
+        await self._store(track, result)
+        return True
+
+    async def _store(self, track: Track, result: LyricsResult):
+        _, created = await TrackLyrics.objects.aget_or_create(
+            track=track,
+            defaults={
+                "lyrics": result.lyrics,
+                "provider": result.provider,
+            }
         )
-        stats.views += 1
-        stats.last_viewed_at = timezone.now()
-        stats.save(update_fields=["views", "last_viewed_at"])
-        return stats
\ No newline at end of file
+
+        if created:
+            await index_tracks_async([track.id])
+
+    async def _get_external(self, artist: str, title: str) -> LyricsResult | None:
+        key = lyrics_cache_key(artist, title)
+
+        cached = await cache.aget(key)
+        if cached is not None:
+            # Пустой кортеж — закэшированный «не найден»
+            return LyricsResult(*cached) if cached else None
+
+        return await lyrics_fetches.do(
+            key,
+            lambda: self._fetch_and_cache(key, artist, title),
+        )
+
+    async def _fetch_and_cache(self, key: str, artist: str, title: str) -> LyricsResult | None:
+        try:
+            result = await self.providers.get_lyrics(artist, title)
+        except LyricsProviderError as e:
+            logger.warning(f"Lyrics providers failed: {artist} — {title}: {e}")
+            return None
+
+        if result:
+            await cache.aset(key, tuple(result), self.CACHE_TTL)
+        else:
+            await cache.aset(key, (), self.NOT_FOUND_TTL)
+
+        return result
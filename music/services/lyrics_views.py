@@ -0,0 +1,179 @@
+"""
+Буферизованные счётчики просмотров текстов песен.
+
+Просмотры копятся в памяти процесса и раз в FLUSH_INTERVAL секунд
+записываются пачкой UPDATE ... SET views = views + n, поэтому
+популярный трек не превращается в горячую строку с блокировкой
+на каждый просмотр. При остановке процесса теряется не больше
+одного интервала просмотров.
+
+Если пачка не записалась не из-за соединения с БД, треки
+записываются по одному; трек, который не удаётся записать
+MAX_FLUSH_ATTEMPTS раз подряд (например, удалённый), отбрасывается.
+Буфер ограничен MAX_PENDING треками.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from integrations.cache import TTLCache
+from music.models import TrackLyricsStats
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 5
+KNOWN_VIEWS_CACHE_SIZE = 10_000
+KNOWN_VIEWS_TTL = 10 * 60
+MAX_FLUSH_ATTEMPTS = 3
+MAX_PENDING = 50_000
+
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+@transaction.atomic
+def flush_views(pending: dict[int, int]) -> dict[int, int]:
+    """
+    Прибавить накопленные просмотры и вернуть итоговые значения из БД.
+
+    Треки с одинаковым приростом обновляются одним запросом.
+
+    :param pending: track_id -> число новых просмотров
+    :return: track_id -> views после обновления
+    """
+    now = timezone.now()
+
+    TrackLyricsStats.objects.bulk_create(
+        [TrackLyricsStats(track_id=track_id, last_viewed_at=now) for track_id in pending],
+        ignore_conflicts=True,
+    )
+
+    by_increment = defaultdict(list)
+    for track_id, count in pending.items():
+        by_increment[count].append(track_id)
+
+    for count, track_ids in by_increment.items():
+        TrackLyricsStats.objects.filter(track_id__in=track_ids).update(
+            views=F("views") + count,
+            last_viewed_at=now,
+        )
+
+    return dict(
+        TrackLyricsStats.objects
+        .filter(track_id__in=pending)
+        .values_list("track_id", "views")
+    )
+
+
+flush_views_async = sync_to_async(flush_views, thread_sensitive=True)
+
+
+class LyricsViewCounter:
+    """
+    Счётчик просмотров с отложенной записью.
+
+    add() возвращает оценку общего числа просмотров: последнее значение
+    из БД плюс ещё не записанные просмотры этого процесса. По ней
+    LyricsService решает, пора ли сохранить текст.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+
+        self.pending: dict[int, int] = defaultdict(int)
+        self.attempts: dict[int, int] = {}
+        self.known = TTLCache(KNOWN_VIEWS_CACHE_SIZE, KNOWN_VIEWS_TTL)
+
+        self._task: asyncio.Task | None = None
+
+    async def add(self, track_id: int) -> int:
+        known = self.known.get(track_id)
+        if known is None:
+            known = await (
+                TrackLyricsStats.objects
+                .filter(track_id=track_id)
+                .values_list("views", flat=True)
+                .afirst()
+            ) or 0
+            self.known.set(track_id, known)
+
+        self.pending[track_id] += 1
+        self._ensure_running()
+
+        return known + self.pending[track_id]
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while self.pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, defaultdict(int)
+
+        try:
+            views = await asyncio.shield(flush_views_async(batch))
+        except TRANSIENT_ERRORS:
+            logger.exception(f"Lyrics views flush failed tracks={len(batch)}")
+            self._requeue(batch)
+            return
+        except Exception:
+            logger.exception(
+                f"Lyrics views flush failed tracks={len(batch)}, retrying track by track"
+            )
+            views = await self._flush_each(batch)
+
+        for track_id, count in views.items():
+            self.attempts.pop(track_id, None)
+            self.known.set(track_id, count)
+
+    async def _flush_each(self, batch: dict[int, int]) -> dict[int, int]:
+        views = {}
+        items = list(batch.items())
+
+        for position, (track_id, count) in enumerate(items):
+            try:
+                views.update(await asyncio.shield(flush_views_async({track_id: count})))
+            except TRANSIENT_ERRORS:
+                logger.exception("Lyrics views flush interrupted")
+                self._requeue(dict(items[position:]))
+                break
+            except Exception:
+                attempts = self.attempts.get(track_id, 0) + 1
+
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self.attempts.pop(track_id, None)
+                    logger.exception(
+                        f"Lyrics views dropped after {attempts} attempts "
+                        f"track_id={track_id} views={count}"
+                    )
+                else:
+                    self.attempts[track_id] = attempts
+                    self._requeue({track_id: count})
+
+        return views
+
+    def _requeue(self, batch: dict[int, int]):
+        dropped = 0
+
+        for track_id, count in batch.items():
+            if track_id not in self.pending and len(self.pending) >= MAX_PENDING:
+                dropped += 1
+                continue
+            self.pending[track_id] += count
+
+        if dropped:
+            logger.warning(f"Lyrics views buffer full, dropped tracks={dropped}")
+
+
+lyrics_views = LyricsViewCounter()
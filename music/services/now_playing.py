@@ -0,0 +1,191 @@
+"""
+Состояние «сейчас играет» пользователя.
+
+Скробблер публикует результат каждого опроса в NowPlayingSnapshot
+со сроком valid_until — временем следующего опроса этого пользователя,
+и веб-запросы отдают снимок без обращения к API сервисов. Живой
+запрос к сервису выполняется асинхронными клиентами, только если
+срок снимка истёк; одновременные запросы одного пользователя
+объединяются в один, а результат сохраняется как новый снимок
+на NOW_PLAYING_MAX_AGE секунд.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from spotipy import SpotifyException, SpotifyOauthError
+
+from MusicTrace import settings
+from integrations.singleflight import SingleFlight
+from integrations.spotify.async_api import AsyncSpotifyMusicAPI
+from integrations.spotify.utils import aget_valid_spotify_token
+from integrations.yandex.async_api import AsyncYandexMusicAPI
+from music.models import NowPlayingSnapshot, UserMusicService
+
+# Живой запрос выполняется в веб-запросе пользователя
+LIVE_FETCH_TIMEOUT = 5
+
+live_fetches = SingleFlight()
+
+
+def format_yandex_track(track) -> dict:
+    """
+    Ответ now playing по объекту yandex_music.Track или None.
+    """
+    if not track:
+        return {
+            "status": "loading",
+            "source": "yandex"
+        }
+
+    return {
+        "status": "ok",
+        "source": "yandex",
+        "track": {
+            "external_id": str(track.id),
+            "title": track.title,
+            "artist": (
+                track.artists[0].name
+                if track.artists else "Unknown"
+            ),
+            "cover": (
+                "https://" + str(track.cover_uri).replace("%%", "orig")
+                if track.cover_uri else ""
+            ),
+            "duration_ms": track.duration_ms,
+        }
+    }
+
+
+def format_spotify_track(data) -> dict:
+    """
+    Ответ now playing по результату parse_current_track.
+    """
+    if not data:
+        return {"status": "empty", "source": "spotify"}
+
+    if not data["is_playing"]:
+        return {"status": "paused", "source": "spotify"}
+
+    return {
+        "status": "ok",
+        "source": "spotify",
+        "track": {
+            "external_id": data["external_id"],
+            "title": data["title"],
+            "artist": data["artist"],
+            "cover": data["cover_url"],
+            "progress_ms": data["progress_ms"],
+            "duration_ms": data["duration_ms"],
+        }
+    }
+
+
+async def fetch_now_playing(service: UserMusicService) -> dict:
+    """
+    Запросить текущий трек напрямую у API сервиса.
+    """
+    if service.service == "yandex":
+        try:
+            track = await AsyncYandexMusicAPI(service.access_token).get_current_track(
+                timeout=LIVE_FETCH_TIMEOUT,
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return {
+                "status": "error",
+                "source": "yandex"
+            }
+
+        return format_yandex_track(track)
+
+    try:
+        access_token = await aget_valid_spotify_token(service)
+        data = await AsyncSpotifyMusicAPI(access_token).get_current_track()
+    except (SpotifyException, SpotifyOauthError):
+        return {
+            "status": "auth_error",
+            "source": "spotify"
+        }
+
+    return format_spotify_track(data)
+
+
+def save_snapshots(snapshots: list[tuple[int, str, dict, datetime]]):
+    """
+    Сохранить снимки одним upsert-запросом.
+
+    :param snapshots: список (user_id, service, payload, valid_until)
+    """
+    if not snapshots:
+        return
+
+    now = timezone.now()
+
+    NowPlayingSnapshot.objects.bulk_create(
+        [
+            NowPlayingSnapshot(
+                user_id=user_id,
+                service=service,
+                payload=payload,
+                updated_at=now,
+                valid_until=valid_until,
+            )
+            for user_id, service, payload, valid_until in snapshots
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "service"],
+        update_fields=["payload", "updated_at", "valid_until"],
+    )
+
+
+save_snapshots_async = sync_to_async(save_snapshots, thread_sensitive=True)
+
+
+def fresh_snapshots():
+    """
+    Снимки, срок которых ещё не истёк.
+    """
+    return NowPlayingSnapshot.objects.filter(valid_until__gte=timezone.now())
+
+
+async def get_fresh_snapshot(user_id: int, service: str) -> dict | None:
+    return await (
+        fresh_snapshots()
+        .filter(user_id=user_id, service=service)
+        .values_list("payload", flat=True)
+        .afirst()
+    )
+
+
+async def _fetch_and_save(service: UserMusicService) -> dict:
+    payload = await fetch_now_playing(service)
+
+    if payload["status"] not in ("auth_error", "error"):
+        valid_until = timezone.now() + timedelta(seconds=settings.NOW_PLAYING_MAX_AGE)
+        await save_snapshots_async([(service.user_id, service.service, payload, valid_until)])
+
+    return payload
+
+
+async def get_now_playing(service: UserMusicService | None, source: str) -> dict:
+    """
+    Состояние «сейчас играет» для подключённого сервиса.
+
+    :param service: подключение пользователя или None
+    """
+    if not service:
+        return {
+            "status": "not_connected",
+            "source": source
+        }
+
+    payload = await get_fresh_snapshot(service.user_id, source)
+    if payload is not None:
+        return payload
+
+    return await live_fetches.do(
+        (service.user_id, source),
+        lambda: _fetch_and_save(service),
+    )
@@ -0,0 +1,246 @@
+"""
+Материализованные агрегаты прослушиваний.
+
+- UserListeningHour — почасовые счётчики для графиков активности
+- UserArtistCounter / UserGenreCounter — счётчики артистов и жанров
+
+Агрегаты увеличиваются при записи скробблов upsert-запросами
+и могут быть полностью пересобраны из UserTrackActivity командами
+backfill_listening_hours и rebuild_listening_counters.
+"""
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from music.models import (
+    Track,
+    UserArtistCounter,
+    UserGenreCounter,
+    UserListeningHour,
+    UserTrackActivity,
+)
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def upsert_increment(model, key_fields: list[str], count_fields: list[str], rows):
+    """
+    Вставить строки или увеличить счётчики существующих одним запросом.
+
+    Использует INSERT ... ON CONFLICT DO UPDATE, поддерживаемый
+    и PostgreSQL, и SQLite.
+
+    :param rows: значения key_fields + count_fields в том же порядке
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [model._meta.get_field(name).column for name in key_fields + count_fields]
+
+    updates = ", ".join(
+        f"{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}"
+        for column in columns[len(key_fields):]
+    )
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(quote(c) for c in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT ({', '.join(quote(c) for c in columns[:len(key_fields)])}) "
+            f"DO UPDATE SET {updates}",
+            rows,
+        )
+
+
+def hour_bucket(played_at: datetime) -> datetime:
+    """
+    Начало часа прослушивания в UTC.
+    """
+    return played_at.astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def add_listening_hours(plays):
+    """
+    Увеличить почасовые счётчики на переданные прослушивания.
+
+    :param plays: итерируемое из (user_id, service, played_at)
+    """
+    counts = Counter(
+        (user_id, service, hour_bucket(played_at))
+        for user_id, service, played_at in plays
+    )
+
+    upsert_increment(
+        UserListeningHour,
+        ["user", "service", "hour"],
+        ["play_count"],
+        (
+            (user_id, service, connection.ops.adapt_datetimefield_value(hour), count)
+            for (user_id, service, hour), count in counts.items()
+        ),
+    )
+
+
+def add_listening_counters(plays):
+    """
+    Увеличить счётчики артистов и жанров на переданные прослушивания.
+
+    Должна вызываться до вставки прослушиваний и в той же транзакции:
+    трек учитывается в track_count, только если пользователь ещё
+    не слушал его. Сервис, артист и жанр берутся из сохранённого Track,
+    как и в rebuild_listening_counters.
+
+    :param plays: список из (user_id, track_id)
+    """
+    plays = list(plays)
+    if not plays:
+        return
+
+    tracks = {
+        track_id: (service, artist, genre)
+        for track_id, service, artist, genre in (
+            Track.objects
+            .filter(id__in={track_id for _, track_id in plays})
+            .values_list("id", "service", "artist", "genre")
+        )
+    }
+
+    seen = set(
+        UserTrackActivity.objects
+        .filter(
+            user_id__in={user_id for user_id, _ in plays},
+            track_id__in=tracks,
+        )
+        .values_list("user_id", "track_id")
+        .distinct()
+    )
+
+    counters = {UserArtistCounter: {}, UserGenreCounter: {}}
+
+    for user_id, track_id in plays:
+        service, artist, genre = tracks[track_id]
+        is_new = (user_id, track_id) not in seen
+        seen.add((user_id, track_id))
+
+        for model, name in ((UserArtistCounter, artist), (UserGenreCounter, genre)):
+            if not name:
+                continue
+
+            counts = counters[model].setdefault((user_id, service, name), [0, 0])
+            counts[0] += is_new
+            counts[1] += 1
+
+    for model, counts in counters.items():
+        upsert_increment(
+            model,
+            ["user", "service", "name"],
+            ["track_count", "play_count"],
+            (key + tuple(values) for key, values in counts.items()),
+        )
+
+
+def _bulk_rebuild(model, rows, build) -> int:
+    created = 0
+    batch = []
+
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(build(row))
+
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    model.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+@transaction.atomic
+def rebuild_listening_hours(user_ids=None) -> int:
+    """
+    Пересобрать почасовые агрегаты из истории прослушиваний.
+
+    :param user_ids: ограничить пересборку этими пользователями
+    :return: количество созданных строк
+    """
+    activities = UserTrackActivity.objects.all()
+    rollups = UserListeningHour.objects.all()
+
+    if user_ids is not None:
+        activities = activities.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    rollups.delete()
+
+    rows = (
+        activities
+        .annotate(hour=TruncHour("played_at", tzinfo=dt_timezone.utc))
+        .values("user_id", "track__service", "hour")
+        .annotate(play_count=Count("id"))
+        .order_by()
+    )
+
+    return _bulk_rebuild(
+        UserListeningHour,
+        rows,
+        lambda row: UserListeningHour(
+            user_id=row["user_id"],
+            service=row["track__service"],
+            hour=row["hour"],
+            play_count=row["play_count"],
+        ),
+    )
+
+
+@transaction.atomic
+def rebuild_listening_counters(user_ids=None) -> int:
+    """
+    Пересобрать счётчики артистов и жанров из истории прослушиваний.
+
+    :param user_ids: ограничить пересборку этими пользователями
+    :return: количество созданных строк
+    """
+    activities = UserTrackActivity.objects.all()
+    if user_ids is not None:
+        activities = activities.filter(user_id__in=user_ids)
+
+    created = 0
+
+    for model, field in ((UserArtistCounter, "track__artist"), (UserGenreCounter, "track__genre")):
+        counters = model.objects.all()
+        if user_ids is not None:
+            counters = counters.filter(user_id__in=user_ids)
+        counters.delete()
+
+        rows = (
+            activities
+            .exclude(**{field: ""})
+            .values("user_id", "track__service", field)
+            .annotate(
+                track_count=Count("track_id", distinct=True),
+                play_count=Count("id"),
+            )
+            .order_by()
+        )
+
+        created += _bulk_rebuild(
+            model,
+            rows,
+            lambda row, model=model, field=field: model(
+                user_id=row["user_id"],
+                service=row["track__service"],
+                name=row[field],
+                track_count=row["track_count"],
+                play_count=row["play_count"],
+            ),
+        )
+
+    return created
@@ -0,0 +1,283 @@
+"""
+Полнотекстовый поиск по трекам и сохранённым текстам песен.
+
+Индекс — отдельная таблица music_track_search, которую создаёт
+обработчик post_migrate:
+- SQLite: виртуальная таблица FTS5 (rowid = track_id)
+- PostgreSQL: tsvector с GIN-индексом
+
+Название и артист весят больше жанра, жанр — больше текста песни.
+Тексты в TrackLyrics хранятся сжатыми, поэтому документ индекса
+собирается в Python и передаётся в БД готовыми строками.
+
+Индекс обновляется при создании треков (resolve_track_ids) и при
+сохранении текста (LyricsService); полная перестройка —
+manage.py rebuild_search_index.
+"""
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.db.models.expressions import RawSQL
+
+from music.models import Track, TrackLyrics
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "music_track_search"
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Ранжируются не больше SEARCH_CANDIDATES совпадений, чтобы частые
+# слова не заставляли считать релевантность по всему индексу
+SEARCH_CANDIDATES = 1000
+MAX_QUERY_TOKENS = 8
+INDEX_BATCH_SIZE = 1000
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def parse_query(query: str) -> list[str]:
+    """
+    Слова запроса без операторов и спецсимволов движков поиска.
+    """
+    return TOKEN_RE.findall(query.casefold())[:MAX_QUERY_TOKENS]
+
+
+class SqliteSearchBackend:
+    def create_index(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            f"USING fts5(title, artist, genre, lyrics, "
+            f"tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def index(self, cursor, rows: list[tuple]):
+        track_ids = [row[0] for row in rows]
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(track_ids))})",
+            track_ids,
+        )
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, artist, genre, lyrics) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def match_query(self, tokens: list[str]) -> str:
+        # Каждое слово — префиксная фраза, слова объединяются через AND
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def matching(self, tokens: list[str]) -> tuple[str, list]:
+        return (
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            [self.match_query(tokens)],
+        )
+
+    def search(self, cursor, tokens: list[str], limit: int) -> list[int]:
+        match = self.match_query(tokens)
+        cursor.execute(
+            f"SELECT rowid FROM ("
+            f"SELECT rowid, bm25({SEARCH_TABLE}, 10.0, 10.0, 2.0, 1.0) AS score "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s"
+            f") ORDER BY score, rowid LIMIT %s",
+            [match, SEARCH_CANDIDATES, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    DOCUMENT = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'D')"
+    )
+
+    def create_index(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            f"track_id integer PRIMARY KEY "
+            f"REFERENCES {Track._meta.db_table} (id) ON DELETE CASCADE, "
+            f"document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin "
+            f"ON {SEARCH_TABLE} USING GIN (document)"
+        )
+
+    def index(self, cursor, rows: list[tuple]):
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (track_id, document) "
+            f"VALUES (%s, {self.DOCUMENT}) "
+            f"ON CONFLICT (track_id) DO UPDATE SET document = EXCLUDED.document",
+            rows,
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def match_query(self, tokens: list[str]) -> str:
+        return " & ".join(f"{token}:*" for token in tokens)
+
+    def matching(self, tokens: list[str]) -> tuple[str, list]:
+        return (
+            f"SELECT track_id FROM {SEARCH_TABLE} "
+            f"WHERE document @@ to_tsquery('simple', %s)",
+            [self.match_query(tokens)],
+        )
+
+    def search(self, cursor, tokens: list[str], limit: int) -> list[int]:
+        query = self.match_query(tokens)
+        cursor.execute(
+            f"SELECT track_id FROM ("
+            f"SELECT track_id, document FROM {SEARCH_TABLE} "
+            f"WHERE document @@ to_tsquery('simple', %s) LIMIT %s"
+            f") AS candidates "
+            f"ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, track_id "
+            f"LIMIT %s",
+            [query, SEARCH_CANDIDATES, query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "sqlite": SqliteSearchBackend(),
+    "postgresql": PostgresSearchBackend(),
+}
+
+
+def get_backend(db=connection):
+    return BACKENDS.get(db.vendor)
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Создать таблицу индекса в БД using, если её нет. Подключается к post_migrate.
+    """
+    db = connections[using]
+
+    backend = get_backend(db)
+    if backend is None:
+        return
+
+    with db.cursor() as cursor:
+        backend.create_index(cursor)
+
+
+def build_index_rows(track_ids) -> list[tuple]:
+    lyrics = dict(
+        TrackLyrics.objects
+        .filter(track_id__in=track_ids)
+        .values_list("track_id", "lyrics")
+    )
+
+    return [
+        (track_id, title, artist, genre, lyrics.get(track_id, ""))
+        for track_id, title, artist, genre in (
+            Track.objects
+            .filter(id__in=track_ids)
+            .values_list("id", "title", "artist", "genre")
+        )
+    ]
+
+
+def index_tracks(track_ids):
+    """
+    Добавить или обновить треки в индексе.
+
+    Ошибка индексации логируется и не прерывает запись треков:
+    индекс можно восстановить командой rebuild_search_index.
+    """
+    backend = get_backend()
+    track_ids = list(track_ids)
+
+    if backend is None or not track_ids:
+        return
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(track_ids), INDEX_BATCH_SIZE):
+                rows = build_index_rows(track_ids[start:start + INDEX_BATCH_SIZE])
+                if rows:
+                    backend.index(cursor, rows)
+    except DatabaseError:
+        logger.exception(f"Search indexing failed tracks={len(track_ids)}")
+
+
+index_tracks_async = sync_to_async(index_tracks, thread_sensitive=True)
+
+
+@transaction.atomic
+def rebuild_search_index() -> int:
+    """
+    Перестроить индекс по всем трекам.
+
+    :return: число проиндексированных треков
+    """
+    backend = get_backend()
+    if backend is None:
+        return 0
+
+    with connection.cursor() as cursor:
+        backend.create_index(cursor)
+        backend.clear(cursor)
+
+        indexed = 0
+        batch = []
+
+        for track_id in Track.objects.values_list("id", flat=True).iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(track_id)
+
+            if len(batch) >= INDEX_BATCH_SIZE:
+                rows = build_index_rows(batch)
+                backend.index(cursor, rows)
+                indexed += len(rows)
+                batch = []
+
+        if batch:
+            rows = build_index_rows(batch)
+            backend.index(cursor, rows)
+            indexed += len(rows)
+
+    return indexed
+
+
+def search_track_ids(query: str, limit: int = SEARCH_LIMIT) -> list[int]:
+    """
+    Идентификаторы треков по убыванию релевантности.
+    """
+    backend = get_backend()
+    tokens = parse_query(query)
+
+    if backend is None or not tokens or limit <= 0:
+        return []
+
+    with connection.cursor() as cursor:
+        return backend.search(cursor, tokens, limit)
+
+
+def filter_tracks(queryset, query: str):
+    """
+    Ограничить queryset треками, совпадающими с запросом.
+
+    В отличие от search_track_ids совпадения не ранжируются
+    и не обрезаются: индекс используется как подзапрос id__in,
+    порядок и пагинацию задаёт сам queryset.
+    """
+    backend = get_backend()
+    tokens = parse_query(query)
+
+    if backend is None or not tokens:
+        return queryset.none()
+
+    return queryset.filter(id__in=RawSQL(*backend.matching(tokens)))
+
+
+def search_tracks(query: str, limit: int = SEARCH_LIMIT) -> list[Track]:
+    track_ids = search_track_ids(query, limit)
+    tracks = Track.objects.in_bulk(track_ids)
+    return [tracks[track_id] for track_id in track_ids if track_id in tracks]
@@ -1,6 +1,12 @@
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
 from integrations.spotify.api import SpotifyMusicAPI
 from integrations.spotify.utils import get_valid_spotify_token
-from music.models import Track, UserTrackActivity
+from music.models import UserTrackActivity
+from music.services.rollups import add_listening_counters, add_listening_hours
+from music.services.stats_cache import bump_data_versions
+from music.services.track_cache import resolve_track_ids
 
 
 def sync_spotify_recent_history(user, service, limit=50):
@@ -9,22 +15,47 @@ def sync_spotify_recent_history(user, service, limit=50):
 
     tracks = api.get_recently_played(limit=limit)
 
-    for data in tracks:
-        track, _ = Track.objects.get_or_create(
-            service="spotify",
-            external_id=data["external_id"],
-            defaults={
-                "title": data["title"],
-                "artist": data["artist"],
-                "track_url": data["track_url"],
-                "cover_url": data["cover_url"],
-                "duration_ms": data["duration_ms"],
-                "genre": "",
-            }
-        )
-
-        UserTrackActivity.objects.get_or_create(
-            user=user,
-            track=track,
-            played_at=data["played_at"]
-        )
\ No newline at end of file
+    save_recent_history(user, tracks)
+
+
+@transaction.atomic
+def save_recent_history(user, tracks: list[dict]):
+    """
+    Записать недостающие прослушивания вместе со счётчиками,
+    почасовыми агрегатами и версией данных в одной транзакции.
+    """
+    track_ids = resolve_track_ids([
+        {**data, "service": "spotify", "genre": ""}
+        for data in tracks
+    ])
+
+    plays = {
+        (track_ids[("spotify", data["external_id"])], parse_datetime(data["played_at"])): data
+        for data in tracks
+    }
+
+    existing = set(
+        UserTrackActivity.objects
+        .filter(user=user, played_at__in=[played_at for _, played_at in plays])
+        .values_list("track_id", "played_at")
+    )
+
+    new_plays = [key for key in plays if key not in existing]
+
+    add_listening_counters(
+        (user.id, track_id)
+        for track_id, _ in new_plays
+    )
+
+    UserTrackActivity.objects.bulk_create([
+        UserTrackActivity(user=user, track_id=track_id, played_at=played_at)
+        for track_id, played_at in new_plays
+    ])
+
+    add_listening_hours(
+        (user.id, "spotify", played_at)
+        for _, played_at in new_plays
+    )
+
+    if new_plays:
+        bump_data_versions([user.id])
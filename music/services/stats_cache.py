@@ -0,0 +1,134 @@
+"""
+Кэш ответов /api/stats/* с версионированием по данным пользователя.
+
+Ключ ответа — (пользователь, endpoint, параметры запроса, версия данных).
+Версия данных обновляется слоем записи прослушиваний, поэтому после
+нового скроббла старые записи кэша просто перестают использоваться
+и истекают сами. Ключ дополнительно включает номер окна длиной
+STATS_CACHE_TIMEOUT: ответы, зависящие от текущего времени
+(активность за последние сутки и т.п.), обновляются не реже раза в окно.
+
+Ответы содержат ETag и Last-Modified, так что повторный запрос
+браузера с If-None-Match получает 304 без обращения к агрегатам.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from MusicTrace import settings
+from music.models import UserDataVersion
+
+CACHE_PREFIX = "stats"
+
+
+def bump_data_versions(user_ids):
+    """
+    Отметить изменение данных пользователей одним upsert-запросом.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    now = timezone.now()
+
+    UserDataVersion.objects.bulk_create(
+        [UserDataVersion(user_id=user_id, updated_at=now) for user_id in user_ids],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["updated_at"],
+    )
+
+
+def get_data_version(request) -> datetime | None:
+    """
+    Версия данных текущего пользователя, один запрос на HTTP-запрос.
+    """
+    if not hasattr(request, "_stats_data_version"):
+        request._stats_data_version = (
+            UserDataVersion.objects
+            .filter(user=request.user)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+    return request._stats_data_version
+
+
+def _window_start() -> datetime:
+    timeout = settings.STATS_CACHE_TIMEOUT
+    return datetime.fromtimestamp(time.time() // timeout * timeout, dt_timezone.utc)
+
+
+def stats_cache_key(request, endpoint: str) -> str:
+    version = get_data_version(request)
+    params = "&".join(
+        f"{key}={value}"
+        for key, values in sorted(request.GET.lists())
+        for value in values
+    )
+    raw = f"{endpoint}|{params}|{version.timestamp() if version else 0}|{_window_start().timestamp()}"
+
+    return f"{CACHE_PREFIX}:{request.user.id}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def get_or_build(request, endpoint: str, build):
+    """
+    Закэшированные данные endpoint'а или результат build().
+    """
+    key = stats_cache_key(request, endpoint)
+    payload = cache.get(key)
+
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, settings.STATS_CACHE_TIMEOUT)
+
+    return payload
+
+
+def _last_modified(request, *args, **kwargs) -> datetime:
+    version = get_data_version(request)
+    window_start = _window_start()
+    return max(version, window_start) if version else window_start
+
+
+def cached_stats(endpoint: str):
+    """
+    Декоратор view статистики: кэширует тело ответа и отвечает 304
+    на условные запросы, если версия данных не изменилась.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            return stats_cache_key(request, endpoint).rsplit(":", 1)[1]
+
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            key = stats_cache_key(request, endpoint)
+            content = cache.get(key)
+
+            if content is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.content, settings.STATS_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(content, content_type="application/json")
+
+            return response
+
+        conditional_view = condition(etag_func=etag, last_modified_func=_last_modified)(cached_view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,167 @@
+"""
+Агрегация прослушиваний по временным корзинам на стороне БД.
+
+Корзины считаются через Trunc/Extract и GROUP BY по почасовым
+агрегатам UserListeningHour, поэтому объекты моделей не создаются,
+а объём работы не зависит от числа прослушиваний. Поддерживаются
+произвольный диапазон, шаг hour/day/week/month и часовой пояс запроса.
+Работает одинаково на PostgreSQL и SQLite.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone, tzinfo
+
+from django.db.models import F, Sum
+from django.db.models.functions import (
+    ExtractHour,
+    ExtractIsoWeekDay,
+    ExtractMonth,
+    TruncDay,
+    TruncHour,
+    TruncMonth,
+    TruncWeek,
+)
+
+from music.models import UserListeningHour
+from music.services.rollups import hour_bucket
+
+MAX_BUCKETS = 5000
+
+GRANULARITIES = {
+    "hour": TruncHour,
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+HISTOGRAMS = {
+    # period: (окно, число корзин, извлечение корзины, номер первой корзины)
+    "day": (timedelta(hours=24), 24, ExtractHour, 0),
+    "week": (timedelta(days=7), 7, ExtractIsoWeekDay, 1),
+    "month": (timedelta(days=365), 12, ExtractMonth, 1),
+}
+
+
+def _listening_hours(user, service, start: datetime, end: datetime | None = None):
+    qs = UserListeningHour.objects.filter(
+        user=user,
+        service=service,
+        hour__gte=hour_bucket(start),
+    )
+    if end is not None:
+        qs = qs.filter(hour__lt=end)
+    return qs
+
+
+def truncate(value: datetime, granularity: str, tz: tzinfo) -> datetime:
+    """
+    Начало корзины, содержащей value, в часовом поясе tz.
+    """
+    if granularity == "hour":
+        return hour_bucket(value).astimezone(tz)
+
+    local = value.astimezone(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if granularity == "week":
+        local -= timedelta(days=local.weekday())
+    elif granularity == "month":
+        local = local.replace(day=1)
+
+    return _localize(local, tz)
+
+
+def _localize(local: datetime, tz: tzinfo) -> datetime:
+    # Пересчитать смещение после арифметики по «настенному» времени
+    return local.replace(tzinfo=None).replace(tzinfo=tz)
+
+
+def _next_bucket(bucket: datetime, granularity: str, tz: tzinfo) -> datetime:
+    if granularity == "hour":
+        return (bucket.astimezone(dt_timezone.utc) + timedelta(hours=1)).astimezone(tz)
+    if granularity == "day":
+        return _localize(bucket + timedelta(days=1), tz)
+    if granularity == "week":
+        return _localize(bucket + timedelta(days=7), tz)
+
+    year, month = divmod(bucket.month, 12)
+    return _localize(bucket.replace(year=bucket.year + year, month=month + 1), tz)
+
+
+def bucket_starts(start: datetime, end: datetime, granularity: str, tz: tzinfo) -> list[datetime]:
+    """
+    Плотный список начал корзин, пересекающихся с [start, end).
+
+    :raises ValueError: при неизвестном шаге или слишком большом числе корзин
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    buckets = []
+    bucket = truncate(start, granularity, tz)
+
+    while bucket < end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError("Too many buckets")
+        bucket = _next_bucket(bucket, granularity, tz)
+
+    return buckets
+
+
+def listening_series(
+    user,
+    service: str,
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    tz: tzinfo,
+) -> tuple[list[datetime], list[int]]:
+    """
+    Число прослушиваний по корзинам диапазона [start, end).
+
+    :return: (начала корзин, значения) — плотные массивы одинаковой длины
+    """
+    buckets = bucket_starts(start, end, granularity, tz)
+    if not buckets:
+        return [], []
+
+    if granularity == "hour":
+        # Агрегаты уже лежат по началам часов UTC — как и корзины truncate();
+        # TruncHour в поясе с нецелым смещением дал бы другие ключи
+        bucket = F("hour")
+    else:
+        bucket = GRANULARITIES[granularity]("hour", tzinfo=tz)
+
+    rows = (
+        _listening_hours(user, service, buckets[0], end)
+        .annotate(bucket=bucket)
+        .values_list("bucket")
+        .annotate(plays=Sum("play_count"))
+        .order_by()
+    )
+
+    plays = dict(rows)
+
+    return buckets, [plays.get(bucket, 0) for bucket in buckets]
+
+
+def activity_histogram(user, service: str, period: str, now: datetime, tz: tzinfo) -> list[int]:
+    """
+    Распределение прослушиваний за период по часам суток,
+    дням недели или месяцам года.
+
+    :raises KeyError: при неизвестном периоде
+    """
+    window, size, extract, first = HISTOGRAMS[period]
+
+    rows = (
+        _listening_hours(user, service, now - window)
+        .annotate(bucket=extract("hour", tzinfo=tz))
+        .values_list("bucket")
+        .annotate(plays=Sum("play_count"))
+        .order_by()
+    )
+
+    data = [0] * size
+    for bucket, plays in rows:
+        data[bucket - first] += plays
+
+    return data
@@ -0,0 +1,120 @@
+"""
+Кэш идентификаторов треков.
+
+Популярные треки повторяются у тысяч пользователей, поэтому вместо
+Track.objects.get_or_create на каждое прослушивание идентификатор
+трека берётся из ограниченного LRU-кэша (service, external_id) → id.
+Промахи разрешаются пачкой: SELECT существующих треков, а для
+новых — bulk INSERT и SELECT их идентификаторов; в поисковый
+индекс попадают только новые треки.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from integrations.cache import TTLCache
+from music.models import Track
+from music.services.search import index_tracks
+
+TRACK_ID_CACHE_SIZE = 100_000
+TRACK_ID_CACHE_TTL = 60 * 60
+
+
+class TrackIdCache(TTLCache):
+    """
+    LRU-кэш с TTL для идентификаторов треков с пакетными операциями.
+
+    Счётчики hits/misses доступны через stats() и используются
+    для подбора размера кэша.
+    """
+
+    def __init__(self, maxsize: int = TRACK_ID_CACHE_SIZE, ttl: float = TRACK_ID_CACHE_TTL):
+        super().__init__(maxsize, ttl)
+
+    def get_many(self, keys) -> dict[tuple[str, str], int]:
+        """
+        Вернуть найденные в кэше идентификаторы для переданных ключей.
+        """
+        found = {}
+        for key in keys:
+            track_id = self.get(key)
+            if track_id is not None:
+                found[key] = track_id
+        return found
+
+    def set_many(self, mapping: dict[tuple[str, str], int]):
+        for key, track_id in mapping.items():
+            self.set(key, track_id)
+
+
+track_id_cache = TrackIdCache()
+
+
+def resolve_track_ids(tracks_data: list[dict]) -> dict[tuple[str, str], int]:
+    """
+    Получить идентификаторы треков, создав недостающие.
+
+    :param tracks_data: словари с полями service, external_id и метаданными
+    :return: словарь (service, external_id) → track_id
+    """
+    unique = {}
+    for data in tracks_data:
+        unique.setdefault((data["service"], data["external_id"]), data)
+
+    resolved = track_id_cache.get_many(unique)
+    missing = [data for key, data in unique.items() if key not in resolved]
+
+    if not missing:
+        return resolved
+
+    fetched = _fetch_track_ids(missing)
+    created = [data for data in missing if (data["service"], data["external_id"]) not in fetched]
+
+    if created:
+        Track.objects.bulk_create(
+            [
+                Track(
+                    service=data["service"],
+                    external_id=data["external_id"],
+                    title=data["title"],
+                    artist=data["artist"],
+                    track_url=data.get("track_url", ""),
+                    cover_url=data.get("cover_url", ""),
+                    duration_ms=data["duration_ms"],
+                    genre=data.get("genre", ""),
+                )
+                for data in created
+            ],
+            ignore_conflicts=True,
+        )
+
+        created_ids = _fetch_track_ids(created)
+        fetched.update(created_ids)
+
+        # В поиск попадают только новые треки, а не все промахи кэша
+        index_tracks(created_ids.values())
+
+    # Кэш заполняется только после фиксации: при откате внешней
+    # транзакции в нём остались бы id несуществующих треков
+    transaction.on_commit(lambda: track_id_cache.set_many(fetched))
+    resolved.update(fetched)
+
+    return resolved
+
+
+def _fetch_track_ids(tracks_data: list[dict]) -> dict[tuple[str, str], int]:
+    by_service: dict[str, list[str]] = {}
+    for data in tracks_data:
+        by_service.setdefault(data["service"], []).append(data["external_id"])
+
+    condition = Q()
+    for service, external_ids in by_service.items():
+        condition |= Q(service=service, external_id__in=external_ids)
+
+    return {
+        (service, external_id): track_id
+        for track_id, service, external_id in (
+            Track.objects
+            .filter(condition)
+            .values_list("id", "service", "external_id")
+        )
+    }
@@ -1,10 +1,17 @@
+from django.db import transaction
 from django.utils import timezone
-from music.models import UserTrackActivity, Track
+from music.models import UserTrackActivity
+from music.services.rollups import add_listening_counters, add_listening_hours
+from music.services.stats_cache import bump_data_versions
+from music.services.track_cache import resolve_track_ids
 
 
+@transaction.atomic
 def save_yandex_current_track(user, yandex_track):
     """
     Сохраняет текущий трек Яндекс Музыки и активность пользователя.
+
+    :return: идентификатор трека в БД
     """
 
     artist = (
@@ -20,18 +27,18 @@ def save_yandex_current_track(user, yandex_track):
     if yandex_track.cover_uri:
         cover_url = "https://" + str(yandex_track.cover_uri).replace("%%", "orig")
 
-    track, _ = Track.objects.get_or_create(
-        service="yandex",
-        external_id=str(yandex_track.id),
-        defaults={
-            "title": yandex_track.title,
-            "artist": artist,
-            "track_url": "",
-            "cover_url": cover_url,
-            "duration_ms": yandex_track.duration_ms,
-            "genre": genre,
-        }
-    )
+    external_id = str(yandex_track.id)
+
+    track_id = resolve_track_ids([{
+        "service": "yandex",
+        "external_id": external_id,
+        "title": yandex_track.title,
+        "artist": artist,
+        "track_url": "",
+        "cover_url": cover_url,
+        "duration_ms": yandex_track.duration_ms,
+        "genre": genre,
+    }])[("yandex", external_id)]
 
     last_activity = (
         UserTrackActivity.objects
@@ -42,11 +49,14 @@ def save_yandex_current_track(user, yandex_track):
 
     now = timezone.now()
 
-    if not last_activity or last_activity.track != track:
+    if not last_activity or last_activity.track_id != track_id:
+        add_listening_counters([(user.id, track_id)])
         UserTrackActivity.objects.create(
             user=user,
-            track=track,
+            track_id=track_id,
             played_at=now
         )
+        add_listening_hours([(user.id, "yandex", now)])
+        bump_data_versions([user.id])
 
-    return track
+    return track_id
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+
+from music.fields import compress_text, decompress_text
+from music.models import Track, TrackLyrics
+
+TEXT = "Первая строка\nC:\\path\\to \\x00 and \\n literal\n" * 50
+
+
+class CompressedTextFieldTests(TestCase):
+    def setUp(self):
+        self.track = Track.objects.create(
+            service="spotify",
+            external_id="1",
+            title="Song",
+            artist="Artist",
+            duration_ms=1000,
+        )
+
+    def raw_lyrics(self, pk: int):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT lyrics FROM {TrackLyrics._meta.db_table} WHERE id = %s",
+                [pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_round_trip(self):
+        lyrics = TrackLyrics.objects.create(track=self.track, lyrics=TEXT, provider="lyrics_ovh")
+
+        stored = bytes(self.raw_lyrics(lyrics.pk))
+        self.assertLess(len(stored), len(TEXT.encode("utf-8")))
+        self.assertEqual(decompress_text(stored), TEXT)
+
+        self.assertEqual(
+            TrackLyrics.objects.values_list("lyrics", flat=True).get(pk=lyrics.pk),
+            TEXT,
+        )
+        self.assertEqual(TrackLyrics.objects.get(pk=lyrics.pk).lyrics, TEXT)
+
+    def test_reads_uncompressed_rows(self):
+        lyrics = TrackLyrics.objects.create(track=self.track, lyrics="", provider="lyrics_ovh")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {TrackLyrics._meta.db_table} SET lyrics = %s WHERE id = %s",
+                [TEXT.encode("utf-8"), lyrics.pk],
+            )
+
+        self.assertEqual(TrackLyrics.objects.get(pk=lyrics.pk).lyrics, TEXT)
+
+    def test_decompress_text_accepts_legacy_values(self):
+        self.assertEqual(decompress_text(TEXT), TEXT)
+        self.assertEqual(decompress_text(TEXT.encode("utf-8")), TEXT)
+        self.assertEqual(decompress_text(memoryview(compress_text(TEXT))), TEXT)
+
+    def test_lyrics_deferred_by_default(self):
+        TrackLyrics.objects.create(track=self.track, lyrics=TEXT, provider="lyrics_ovh")
+
+        lyrics = TrackLyrics.objects.get(track=self.track)
+        self.assertEqual(lyrics.get_deferred_fields(), {"lyrics"})
+
+    async def test_get_text(self):
+        await TrackLyrics.objects.acreate(track=self.track, lyrics=TEXT, provider="lyrics_ovh")
+
+        self.assertEqual(await TrackLyrics.objects.get_text(self.track.id), TEXT)
+        self.assertIsNone(await TrackLyrics.objects.get_text(self.track.id + 1))
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase
+
+from music.services import lyrics_views
+from music.services.lyrics_views import MAX_FLUSH_ATTEMPTS, LyricsViewCounter
+
+
+class FakeFlush:
+    """
+    Замена flush_views_async: падает, если в пачке есть трек из bad.
+    """
+
+    def __init__(self, bad=(), error=IntegrityError):
+        self.bad = set(bad)
+        self.error = error
+        self.totals = {}
+
+    async def __call__(self, pending):
+        if self.bad & set(pending):
+            raise self.error("fail")
+        for track_id, count in pending.items():
+            self.totals[track_id] = self.totals.get(track_id, 0) + count
+        return {track_id: self.totals[track_id] for track_id in pending}
+
+
+class LyricsViewCounterTests(SimpleTestCase):
+    def counter(self, pending):
+        counter = LyricsViewCounter()
+        counter.pending.update(pending)
+        return counter
+
+    async def test_failing_track_is_isolated_and_dropped(self):
+        storage = FakeFlush(bad={2})
+        counter = self.counter({1: 3, 2: 1})
+
+        with mock.patch.object(lyrics_views, "flush_views_async", storage), \
+                self.assertLogs(lyrics_views.logger, "ERROR"):
+            await counter.flush()
+
+            self.assertEqual(storage.totals, {1: 3})
+            self.assertEqual(dict(counter.pending), {2: 1})
+
+            for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+                await counter.flush()
+
+        self.assertEqual(dict(counter.pending), {})
+        self.assertEqual(counter.attempts, {})
+        self.assertEqual(counter.known.get(1), 3)
+
+    async def test_transient_error_keeps_views(self):
+        storage = FakeFlush(bad={1}, error=OperationalError)
+        counter = self.counter({1: 2, 2: 1})
+
+        with mock.patch.object(lyrics_views, "flush_views_async", storage), \
+                self.assertLogs(lyrics_views.logger, "ERROR"):
+            for _ in range(MAX_FLUSH_ATTEMPTS + 1):
+                await counter.flush()
+
+        self.assertEqual(dict(counter.pending), {1: 2, 2: 1})
+        self.assertEqual(counter.attempts, {})
+
+    async def test_requeue_is_bounded(self):
+        storage = FakeFlush(bad={1, 2, 3}, error=OperationalError)
+        counter = self.counter({1: 1, 2: 1, 3: 1})
+
+        with mock.patch.object(lyrics_views, "flush_views_async", storage), \
+                mock.patch.object(lyrics_views, "MAX_PENDING", 2), \
+                self.assertLogs(lyrics_views.logger, "WARNING"):
+            await counter.flush()
+
+        self.assertEqual(len(counter.pending), 2)
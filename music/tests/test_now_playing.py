@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from music.services.now_playing import get_fresh_snapshot, save_snapshots_async
+from scrobbling.now_playing import VALID_SLACK, NowPlayingPublisher
+
+PAYLOAD = {"status": "paused", "source": "spotify"}
+
+
+class FreshSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="listener")
+
+    async def test_snapshot_fresh_until_next_poll(self):
+        await self.save(timezone.now() + timedelta(minutes=30))
+        self.assertEqual(await get_fresh_snapshot(self.user.id, "spotify"), PAYLOAD)
+
+    async def test_expired_snapshot_ignored(self):
+        await self.save(timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(await get_fresh_snapshot(self.user.id, "spotify"))
+
+    async def save(self, valid_until):
+        await save_snapshots_async([(self.user.id, "spotify", PAYLOAD, valid_until)])
+
+
+class NowPlayingPublisherTests(TestCase):
+    def test_valid_until_follows_next_poll(self):
+        publisher = NowPlayingPublisher()
+        before = timezone.now()
+
+        publisher.publish(1, "spotify", PAYLOAD, next_poll_in=1800)
+
+        payload, valid_until = publisher.pending[(1, "spotify")]
+        self.assertEqual(payload, PAYLOAD)
+        self.assertGreaterEqual(valid_until, before + timedelta(seconds=1800 + VALID_SLACK))
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from music.models import Track, UserArtistCounter, UserGenreCounter
+from music.services.rollups import rebuild_listening_counters
+from scrobbling.persistence import insert_track_activities
+
+PLAYED_AT = datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def counters(model):
+    return set(
+        model.objects.values_list("user_id", "service", "name", "track_count", "play_count")
+    )
+
+
+class ListeningCountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="listener")
+        Track.objects.create(
+            service="yandex",
+            external_id="1",
+            title="Title",
+            artist="Stored Artist",
+            genre="rock",
+            duration_ms=1000,
+        )
+
+    def test_incremental_counters_match_rebuild(self):
+        # Скроббл Яндекса приходит без жанра и с другим написанием артиста
+        payload = {
+            "service": "yandex",
+            "external_id": "1",
+            "title": "Title",
+            "artist": "stored artist",
+            "duration_ms": 1000,
+        }
+
+        insert_track_activities([
+            (self.user.id, {**payload, "played_at": PLAYED_AT + timedelta(minutes=minutes)})
+            for minutes in range(2)
+        ])
+
+        incremental = counters(UserArtistCounter), counters(UserGenreCounter)
+        self.assertEqual(incremental[1], {(self.user.id, "yandex", "rock", 1, 2)})
+
+        rebuild_listening_counters()
+        self.assertEqual((counters(UserArtistCounter), counters(UserGenreCounter)), incremental)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+
+from integrations.lyrics.chain import LyricsResult
+from music.models import Track
+from music.services.lyrics_service import LyricsService
+from music.services.search import filter_tracks, search_track_ids
+from music.services.track_cache import resolve_track_ids, track_id_cache
+
+
+def track_data(external_id: str, title: str, artist: str, genre: str = "") -> dict:
+    return {
+        "service": "spotify",
+        "external_id": external_id,
+        "title": title,
+        "artist": artist,
+        "genre": genre,
+        "duration_ms": 1000,
+    }
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        track_id_cache.clear()
+
+        self.ids = resolve_track_ids([
+            track_data("1", "Кукушка", "Кино", "rock"),
+            track_data("2", "Bohemian Rhapsody", "Queen", "rock"),
+            track_data("3", "Crème brûlée", "Chef"),
+        ])
+
+    def test_new_tracks_are_searchable(self):
+        self.assertEqual(search_track_ids("кино"), [self.ids[("spotify", "1")]])
+        self.assertEqual(search_track_ids("boh rhaps"), [self.ids[("spotify", "2")]])
+        self.assertEqual(search_track_ids("creme"), [self.ids[("spotify", "3")]])
+        self.assertEqual(len(search_track_ids("rock")), 2)
+
+    def test_title_ranks_above_genre(self):
+        resolve_track_ids([track_data("4", "Rock Song", "Band", "pop")])
+        self.assertEqual(search_track_ids("rock", limit=1), [Track.objects.get(external_id="4").id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('"); DROP', "AND OR NOT", "kino*:& |", "   "):
+            with self.subTest(query=query):
+                self.assertEqual(search_track_ids(query), [])
+
+    def test_filter_tracks_returns_every_match(self):
+        with mock.patch("music.services.search.SEARCH_CANDIDATES", 1):
+            tracks = filter_tracks(Track.objects.order_by("id"), "rock")
+
+            self.assertEqual(
+                list(tracks.values_list("id", flat=True)),
+                sorted([self.ids[("spotify", "1")], self.ids[("spotify", "2")]]),
+            )
+
+        self.assertFalse(filter_tracks(Track.objects.all(), "*&|").exists())
+
+    async def test_stored_lyrics_are_searchable(self):
+        track = await Track.objects.aget(external_id="2")
+
+        await LyricsService()._store(track, LyricsResult("lyrics_ovh", "Is this the real life"))
+
+        self.assertEqual(await self.search("real life"), [track.id])
+
+    async def search(self, query):
+        return await sync_to_async(search_track_ids)(query)
+
+    def test_cache_misses_for_existing_tracks_are_not_reindexed(self):
+        track_id_cache.clear()
+
+        with mock.patch("music.services.track_cache.index_tracks") as index_tracks:
+            resolve_track_ids([track_data("1", "Кукушка", "Кино"), track_data("5", "New", "Artist")])
+
+        index_tracks.assert_called_once()
+        self.assertEqual(list(index_tracks.call_args.args[0]), [Track.objects.get(external_id="5").id])
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from music.models import UserListeningHour
+from music.services.timeseries import listening_series
+
+START = datetime(2026, 3, 2, 0, 0, tzinfo=dt_timezone.utc)
+
+
+class ListeningSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="listener")
+
+        UserListeningHour.objects.bulk_create([
+            UserListeningHour(
+                user=cls.user,
+                service="spotify",
+                hour=START + timedelta(hours=offset),
+                play_count=offset + 1,
+            )
+            for offset in range(6)
+        ])
+
+    def series(self, granularity, tz, hours=8):
+        return listening_series(
+            self.user,
+            "spotify",
+            START,
+            START + timedelta(hours=hours),
+            granularity,
+            tz,
+        )
+
+    def test_hourly_utc(self):
+        _, data = self.series("hour", dt_timezone.utc)
+        self.assertEqual(data, [1, 2, 3, 4, 5, 6, 0, 0])
+
+    def test_hourly_non_whole_hour_offset(self):
+        for name in ("Asia/Kolkata", "Asia/Kathmandu", "America/St_Johns"):
+            with self.subTest(tz=name):
+                buckets, data = self.series("hour", ZoneInfo(name))
+
+                self.assertEqual(data, [1, 2, 3, 4, 5, 6, 0, 0])
+                self.assertEqual(buckets[0], START)
+                self.assertEqual(buckets[0].tzinfo, ZoneInfo(name))
+
+    def test_daily_local_day(self):
+        # 00:00–06:00 UTC — это 05:30–11:30 одного дня в Калькутте
+        buckets, data = self.series("day", ZoneInfo("Asia/Kolkata"), hours=24)
+
+        self.assertEqual(data, [21, 0])
+        self.assertEqual(buckets[0].utcoffset(), timedelta(hours=5, minutes=30))
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.test import TestCase
+
+from music.models import Track
+from music.services.track_cache import resolve_track_ids, track_id_cache
+
+TRACK = {
+    "service": "spotify",
+    "external_id": "track-1",
+    "title": "Title",
+    "artist": "Artist",
+    "duration_ms": 1000,
+}
+KEY = ("spotify", "track-1")
+
+
+class ResolveTrackIdsTests(TestCase):
+    def setUp(self):
+        track_id_cache.clear()
+
+    def test_creates_and_caches_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resolved = resolve_track_ids([TRACK])
+
+        self.assertEqual(resolved[KEY], Track.objects.get().id)
+        self.assertEqual(track_id_cache.get_many([KEY]), resolved)
+
+    def test_rollback_does_not_cache_ids(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    resolve_track_ids([TRACK])
+                    raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(track_id_cache.get_many([KEY]), {})
+        self.assertFalse(Track.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resolved = resolve_track_ids([TRACK])
+
+        self.assertTrue(Track.objects.filter(id=resolved[KEY]).exists())
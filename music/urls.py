@@ -17,9 +17,14 @@ urlpatterns = [
 
     path("track/<int:track_id>/lyrics/", views.track_lyrics, name="track_lyrics"),
 
+    path("api/dashboard/", views.api_dashboard),
     path("api/now-playing/", views.api_now_playing),
+    path("api/live/", views.api_live),
     path("api/stats/summary/", views.api_stats_summary),
+    path("api/stats/top/", views.api_stats_top),
     path("api/stats/recent/", views.api_stats_recent),
     path("api/stats/activity/", views.api_stats_activity),
+    path("api/stats/timeline/", views.api_stats_timeline),
+    path("api/search/", views.api_search),
     path("api/user/services/", views.api_user_services),
 ]
\ No newline at end of file
@@ -1,20 +1,44 @@
-from datetime import timedelta
+import asyncio
+import json
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Count
-from django.http import JsonResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect, aget_object_or_404
 from django.utils import timezone
-from spotipy import SpotifyOAuth, SpotifyException
+from django.utils.dateparse import parse_date, parse_datetime
+from asgiref.sync import sync_to_async
+from spotipy import SpotifyOAuth, SpotifyOauthError
 
 from MusicTrace import settings
-from integrations.spotify.api import SpotifyMusicAPI
-from integrations.spotify.utils import get_valid_spotify_token
-from integrations.yandex.api import YandexMusicAPI
+from integrations.http import get_session, get_timeout
+from integrations.spotify.async_api import request_access_token
 from music.forms import YandexTokenForm
-from music.models import UserMusicService, Track, UserTrackActivity
+from music.models import (
+    UserMusicService,
+    Track,
+    UserArtistCounter,
+    UserGenreCounter,
+)
+from music.services.dashboard import (
+    SOURCE_PRIORITY,
+    build_activity,
+    build_recent,
+    build_services,
+    build_stats,
+    build_summary,
+    get_default_source,
+    get_total_tracks,
+    get_user_services,
+)
+from music.services.live import live_hub
 from music.services.lyrics_service import LyricsService
+from music.services.now_playing import get_now_playing
+from music.services.search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search_tracks
+from music.services.stats_cache import cached_stats, get_or_build
+from music.services.timeseries import HISTOGRAMS, listening_series
 
 
 def landing(request):
@@ -40,7 +64,13 @@ def register(request):
 
 @login_required
 def dashboard(request):
-    return render(request, "music/dashboard.html")
+    initial, _ = build_dashboard(
+        request,
+        source=None,
+        period="day",
+        tz=timezone.get_current_timezone(),
+    )
+    return render(request, "music/dashboard.html", {"initial": initial})
 
 
 @login_required
@@ -78,27 +108,25 @@ def spotify_connect(request):
         redirect_uri=settings.SPOTIFY_REDIRECT_URI,
         scope="user-read-currently-playing user-read-playback-state user-read-recently-played",
         show_dialog=True,
+        requests_session=get_session("spotify"),
+        requests_timeout=get_timeout("spotify"),
     )
     return redirect(oauth.get_authorize_url())
 
 
 @login_required
-def spotify_callback(request):
+async def spotify_callback(request):
     code = request.GET.get("code")
     if not code:
         return redirect("dashboard")
 
-    oauth = SpotifyOAuth(
-        client_id=settings.SPOTIFY_CLIENT_ID,
-        client_secret=settings.SPOTIFY_CLIENT_SECRET,
-        redirect_uri=settings.SPOTIFY_REDIRECT_URI,
-        scope="user-read-currently-playing user-read-playback-state",
-    )
-
-    token_info = oauth.get_access_token(code)
+    try:
+        token_info = await request_access_token(code)
+    except SpotifyOauthError:
+        return redirect("dashboard")
 
-    UserMusicService.objects.update_or_create(
-        user=request.user,
+    await UserMusicService.objects.aupdate_or_create(
+        user=await request.auser(),
         service="spotify",
         defaults={
             "access_token": token_info["access_token"],
@@ -113,215 +141,276 @@ def spotify_callback(request):
 
 @login_required
 def api_user_services(request):
-    services = list(
-        UserMusicService.objects
-        .filter(user=request.user)
-        .values_list("service", flat=True)
-    )
+    return JsonResponse(build_services(get_user_services(request.user)))
 
-    default = None
-    if "yandex" in services:
-        default = "yandex"
-    elif "spotify" in services:
-        default = "spotify"
 
-    return JsonResponse({
-        "services": services,
-        "default": default,
-    })
+@login_required
+async def api_now_playing(request):
+    source = request.GET.get("source")
+
+    if source not in SOURCE_PRIORITY:
+        return JsonResponse({"status": "error", "message": "Invalid source"})
+
+    service = await UserMusicService.objects.filter(
+        user=await request.auser(),
+        service=source
+    ).afirst()
+
+    return JsonResponse(await get_now_playing(service, source))
+
+
+def build_dashboard(request, source, period, tz) -> tuple[dict, UserMusicService | None]:
+    """
+    Состояние дашборда без now playing: сервисы и статистика источника.
+
+    :param source: источник или None для источника по умолчанию
+    :return: (данные, подключение выбранного источника)
+    """
+    services = get_user_services(request.user)
+    source = source or get_default_source(services)
+
+    payload = {
+        "services": build_services(services),
+        "source": source,
+        "period": period,
+    }
+
+    if source is None:
+        return payload, None
+
+    payload.update(get_or_build(
+        request,
+        f"dashboard:{source}:{period}:{tz}",
+        lambda: build_stats(request.user, source, period, tz),
+    ))
+
+    return payload, services.get(source)
 
 
 @login_required
-def api_now_playing(request):
+async def api_dashboard(request):
     source = request.GET.get("source")
+    period = request.GET.get("period", "day")
+    tz = get_request_timezone(request)
 
-    if source not in ("yandex", "spotify"):
+    if source is not None and source not in SOURCE_PRIORITY:
         return JsonResponse({"status": "error", "message": "Invalid source"})
 
-    service = UserMusicService.objects.filter(
-        user=request.user,
-        service=source
-    ).first()
+    if period not in HISTOGRAMS:
+        return JsonResponse({"status": "error", "message": "Invalid period"})
+
+    if tz is None:
+        return JsonResponse({"status": "error", "message": "Invalid timezone"})
+
+    payload, service = await sync_to_async(build_dashboard)(request, source, period, tz)
+
+    if payload["source"] is not None:
+        payload["now_playing"] = await get_now_playing(service, payload["source"])
+
+    return JsonResponse(payload)
+
+
+LIVE_HEARTBEAT_INTERVAL = 15
+LIVE_RETRY_MS = 5000
+
 
-    if not service:
-        return JsonResponse({
-            "status": "not_connected",
-            "source": source
-        })
-
-    if source == "yandex":
-        api = YandexMusicAPI(service.access_token)
-        track = api.get_current_track()
-
-        if not track:
-            return JsonResponse({
-                "status": "loading",
-                "source": "yandex"
-            })
-
-        return JsonResponse({
-            "status": "ok",
-            "source": "yandex",
-            "track": {
-                "external_id": str(track.id),
-                "title": track.title,
-                "artist": (
-                    track.artists[0].name
-                    if track.artists else "Unknown"
-                ),
-                "cover": (
-                    "https://" + str(track.cover_uri).replace("%%", "orig")
-                    if track.cover_uri else ""
-                ),
-                "duration_ms": track.duration_ms,
-            }
-        })
-
-    if source == "spotify":
-        try:
-            access_token = get_valid_spotify_token(service)
-            api = SpotifyMusicAPI(access_token)
-            data = api.get_current_track()
-        except SpotifyException:
-            return JsonResponse({
-                "status": "auth_error",
-                "source": "spotify"
-            })
-
-        if not data:
-            return JsonResponse({"status": "empty", "source": "spotify"})
-
-        if not data["is_playing"]:
-            return JsonResponse({"status": "paused", "source": "spotify"})
-
-        return JsonResponse({
-            "status": "ok",
-            "source": "spotify",
-            "track": {
-                "external_id": data["external_id"],
-                "title": data["title"],
-                "artist": data["artist"],
-                "cover": data["cover_url"],
-                "progress_ms": data["progress_ms"],
-                "duration_ms": data["duration_ms"],
-            }
-        })
+async def live_events(user_id: int):
+    queue = live_hub.subscribe(user_id)
+
+    try:
+        yield f"retry: {LIVE_RETRY_MS}\n\n"
+
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    finally:
+        live_hub.unsubscribe(user_id, queue)
+
+
+async def api_live(request):
+    """
+    Поток Server-Sent Events с now playing и новыми скробблами.
+
+    Требует ASGI: соединение удерживается, пока вкладка открыта.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    response = StreamingHttpResponse(
+        live_events(user.id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+TOP_COUNTERS = {
+    "artists": UserArtistCounter,
+    "genres": UserGenreCounter,
+}
+TOP_LIMIT = 10
+TOP_MAX_LIMIT = 100
 
 
 @login_required
+@cached_stats("summary")
 def api_stats_summary(request):
     source = request.GET.get("source")
 
-    qs = UserTrackActivity.objects.filter(
-        user=request.user,
-        track__service=source
-    )
+    return JsonResponse(build_summary(request.user, source))
 
-    top_genre = (
-        qs.exclude(track__genre="")
-        .values("track__genre")
-        .annotate(c=Count("track_id", distinct=True))
-        .order_by("-c")
-        .first()
-    )
 
-    top_artist = (
-        qs.values("track__artist")
-        .annotate(c=Count("track_id", distinct=True))
-        .order_by("-c")
-        .first()
+@login_required
+@cached_stats("top")
+def api_stats_top(request):
+    source = request.GET.get("source")
+    kind = request.GET.get("kind", "artists")
+    order = "-play_count" if request.GET.get("by") == "plays" else "-track_count"
+
+    if kind not in TOP_COUNTERS:
+        return JsonResponse({"status": "error", "message": "Invalid kind"})
+
+    try:
+        limit = min(int(request.GET.get("limit", TOP_LIMIT)), TOP_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid limit"})
+
+    items = list(
+        TOP_COUNTERS[kind].objects
+        .filter(user=request.user, service=source)
+        .order_by(order, "name")
+        .values("name", "track_count", "play_count")[:max(limit, 0)]
     )
 
-    total = qs.values("track_id").distinct().count() or 1
+    total = get_total_tracks(request.user, source) or 1
 
     return JsonResponse({
-        "top_genre": {
-            "name": top_genre["track__genre"] if top_genre else "—",
-            "percent": int(top_genre["c"] / total * 100) if top_genre else 0,
-        },
-        "top_artist": {
-            "name": top_artist["track__artist"] if top_artist else "—",
-            "percent": int(top_artist["c"] / total * 100) if top_artist else 0,
-        }
+        "kind": kind,
+        "items": [{
+            "name": item["name"],
+            "tracks": item["track_count"],
+            "plays": item["play_count"],
+            "percent": int(item["track_count"] / total * 100),
+        } for item in items]
     })
 
 
 @login_required
+@cached_stats("recent")
 def api_stats_recent(request):
     source = request.GET.get("source")
 
-    qs = (
-        UserTrackActivity.objects
-        .filter(user=request.user, track__service=source)
-        .select_related("track")
-        .order_by("-played_at")[:20]
-    )
+    return JsonResponse(build_recent(request.user, source))
 
-    return JsonResponse({
-        "tracks": [{
-            "title": a.track.title,
-            "artist": a.track.artist,
-            "cover": a.track.cover_url,
-        } for a in qs]
-    })
+
+def get_request_timezone(request):
+    name = request.GET.get("tz")
+    if not name:
+        return timezone.get_current_timezone()
+
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def parse_request_datetime(value, tz):
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(parsed_date, time.min)
+
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=tz)
+
+    return parsed
 
 
 @login_required
+@cached_stats("activity")
 def api_stats_activity(request):
     source = request.GET.get("source")
     period = request.GET.get("period", "day")
-    now = timezone.localtime()
+    tz = get_request_timezone(request)
 
-    if period == "day":
-        data = [0] * 24
-        start = now - timedelta(hours=24)
+    if period not in HISTOGRAMS:
+        return JsonResponse({"status": "error", "message": "Invalid period"})
 
-        qs = UserTrackActivity.objects.filter(
-            user=request.user,
-            track__service=source,
-            played_at__gte=start
-        )
+    if tz is None:
+        return JsonResponse({"status": "error", "message": "Invalid timezone"})
 
-        for a in qs:
-            data[timezone.localtime(a.played_at).hour] += 1
+    return JsonResponse(build_activity(request.user, source, period, tz))
 
-        return JsonResponse({"data": data})
 
-    if period == "week":
-        data = [0] * 7
-        start = now - timedelta(days=7)
+@login_required
+@cached_stats("timeline")
+def api_stats_timeline(request):
+    source = request.GET.get("source")
+    granularity = request.GET.get("granularity", "day")
+    tz = get_request_timezone(request)
+
+    if tz is None:
+        return JsonResponse({"status": "error", "message": "Invalid timezone"})
 
-        qs = UserTrackActivity.objects.filter(
-            user=request.user,
-            track__service=source,
-            played_at__gte=start
+    try:
+        end = parse_request_datetime(request.GET.get("to"), tz) or timezone.now()
+        start = (
+            parse_request_datetime(request.GET.get("from"), tz)
+            or end - timedelta(days=30)
         )
+        buckets, data = listening_series(
+            request.user, source, start, end, granularity, tz
+        )
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)})
 
-        for a in qs:
-            data[timezone.localtime(a.played_at).weekday()] += 1
-
-        return JsonResponse({"data": data})
+    return JsonResponse({
+        "granularity": granularity,
+        "timezone": str(tz),
+        "buckets": [bucket.isoformat() for bucket in buckets],
+        "data": data,
+    })
 
-    if period == "month":
-        data = [0] * 12
-        start = now - timedelta(days=365)
 
-        qs = UserTrackActivity.objects.filter(
-            user=request.user,
-            track__service=source,
-            played_at__gte=start
-        )
+@login_required
+def api_search(request):
+    query = request.GET.get("q", "").strip()
 
-        for a in qs:
-            data[timezone.localtime(a.played_at).month - 1] += 1
+    try:
+        limit = min(int(request.GET.get("limit", SEARCH_LIMIT)), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid limit"})
 
-        return JsonResponse({"data": data})
+    return JsonResponse({
+        "query": query,
+        "items": [{
+            "id": track.id,
+            "service": track.service,
+            "title": track.title,
+            "artist": track.artist,
+            "genre": track.genre,
+            "track_url": track.track_url,
+            "cover_url": track.cover_url,
+        } for track in search_tracks(query, limit)]
+    })
 
 
 @login_required
-def track_lyrics(request, track_id):
-    track = get_object_or_404(Track, id=track_id)
-    lyrics = LyricsService().get_lyrics(track)
+async def track_lyrics(request, track_id):
+    track = await aget_object_or_404(Track, id=track_id)
+    lyrics = await LyricsService().get_lyrics(track)
 
     if not lyrics:
         return render(request, "music/lyrics.html", {"error": "Текст не найден"})
@@ -1,20 +1,28 @@
-from asgiref.sync import sync_to_async
-from integrations.spotify.api import SpotifyMusicAPI
-from integrations.spotify.utils import get_valid_spotify_token
-from music.models import UserMusicService
+from integrations.spotify.async_api import AsyncSpotifyMusicAPI
+from scrobbling.credentials import get_access_token
 
 
-@sync_to_async
-def get_recent_tracks(user):
-    service = UserMusicService.objects.filter(
-        user=user,
-        service="spotify"
-    ).first()
-
-    if not service:
+async def get_recent_tracks(user, after=None):
+    """
+    Прослушивания пользователя после курсора after в хронологическом порядке.
+    """
+    token = await get_access_token(user.id, "spotify")
+    if not token:
         return []
 
-    token = get_valid_spotify_token(service)
-    api = SpotifyMusicAPI(token)
+    api = AsyncSpotifyMusicAPI(token)
+
+    return await api.get_recently_played_after(after)
+
+
+async def get_current_track(user):
+    """
+    Текущий трек пользователя в формате parse_current_track или None.
+    """
+    token = await get_access_token(user.id, "spotify")
+    if not token:
+        return None
+
+    api = AsyncSpotifyMusicAPI(token)
 
-    return api.get_recently_played(limit=10)
+    return await api.get_current_track()
@@ -1,8 +1,6 @@
-from asgiref.sync import sync_to_async
-from integrations.yandex.api import YandexMusicAPI
+from integrations.yandex.async_api import AsyncYandexMusicAPI
 
 
-@sync_to_async
-def get_current_track(token: str):
-    api = YandexMusicAPI(token)
-    return api.get_current_track()
+async def get_current_track(token: str):
+    api = AsyncYandexMusicAPI(token)
+    return await api.get_current_track()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from spotipy import SpotifyOauthError
+
+from integrations.spotify.async_api import refresh_access_token
+from music.models import UserMusicService
+
+logger = logging.getLogger(__name__)
+
+REFRESH_AHEAD = timedelta(minutes=5)
+REFRESH_CHECK_INTERVAL = 30
+MAX_CONCURRENT_REFRESHES = 5
+# Отозванный refresh token не обновится, пока пользователь
+# не переподключит сервис: повторы идут с растущей паузой
+REFRESH_BACKOFF = timedelta(minutes=1)
+MAX_REFRESH_BACKOFF = timedelta(hours=6)
+
+REFRESH_ERRORS = (SpotifyOauthError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class Credential(NamedTuple):
+    access_token: str
+    refresh_token: str | None
+    expires_at: datetime | None
+
+    def expires_within(self, delta: timedelta) -> bool:
+        if self.expires_at is None:
+            return True
+        return self.expires_at - delta <= timezone.now()
+
+
+class CredentialCache:
+    """
+    Кэш токенов подключённых сервисов в процессе скробблера.
+
+    Заполняется и инвалидируется ServiceRegistry по изменённым строкам
+    UserMusicService, поэтому опрос не читает токены из БД.
+
+    После неудачного обновления токен не обновляется до конца паузы;
+    новые токены из БД (переподключение сервиса) сбрасывают паузу.
+    """
+
+    def __init__(self):
+        self.entries: dict[tuple[int, str], Credential] = {}
+        self.backoff: dict[tuple[int, str], tuple[int, datetime]] = {}
+
+    def get(self, user_id: int, service: str) -> Credential | None:
+        return self.entries.get((user_id, service))
+
+    def set(self, user_id: int, service: str, credential: Credential):
+        key = (user_id, service)
+        if self.entries.get(key) != credential:
+            self.backoff.pop(key, None)
+        self.entries[key] = credential
+
+    def discard(self, user_id: int, service: str):
+        self.entries.pop((user_id, service), None)
+        self.backoff.pop((user_id, service), None)
+
+    def record_failure(self, user_id: int, service: str) -> datetime:
+        """
+        Отложить следующее обновление токена.
+
+        :return: время, раньше которого обновление не выполняется
+        """
+        failures = self.backoff.get((user_id, service), (0, None))[0] + 1
+        delay = min(REFRESH_BACKOFF * 2 ** (failures - 1), MAX_REFRESH_BACKOFF)
+        retry_at = timezone.now() + delay
+
+        self.backoff[(user_id, service)] = (failures, retry_at)
+        return retry_at
+
+    def backing_off(self, user_id: int, service: str) -> bool:
+        entry = self.backoff.get((user_id, service))
+        return entry is not None and entry[1] > timezone.now()
+
+    def expiring(self, service: str, delta: timedelta) -> list[int]:
+        return [
+            user_id
+            for (user_id, entry_service), credential in list(self.entries.items())
+            if entry_service == service
+            and credential.refresh_token
+            and credential.expires_within(delta)
+            and not self.backing_off(user_id, service)
+        ]
+
+
+credential_cache = CredentialCache()
+
+_refresh_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REFRESHES)
+_refreshing: dict[int, asyncio.Task] = {}
+
+
+@sync_to_async
+def save_spotify_credential(user_id: int, credential: Credential):
+    UserMusicService.objects.filter(
+        user_id=user_id,
+        service="spotify"
+    ).update(
+        access_token=credential.access_token,
+        refresh_token=credential.refresh_token,
+        expires_at=credential.expires_at,
+        updated_at=timezone.now(),
+    )
+
+
+async def _refresh_spotify_credential(user_id: int) -> Credential | None:
+    async with _refresh_semaphore:
+        credential = credential_cache.get(user_id, "spotify")
+        if not credential or not credential.refresh_token:
+            return credential
+
+        try:
+            token_info = await refresh_access_token(credential.refresh_token)
+        except REFRESH_ERRORS:
+            credential_cache.record_failure(user_id, "spotify")
+            raise
+
+        credential = Credential(
+            access_token=token_info["access_token"],
+            refresh_token=token_info.get("refresh_token") or credential.refresh_token,
+            expires_at=timezone.now() + timedelta(seconds=token_info["expires_in"]),
+        )
+
+        await save_spotify_credential(user_id, credential)
+        credential_cache.set(user_id, "spotify", credential)
+
+        return credential
+
+
+async def refresh_spotify_credential(user_id: int) -> Credential | None:
+    """
+    Обновить токен Spotify пользователя.
+
+    Одновременные обновления одного пользователя объединяются
+    в один запрос, общее число запросов ограничено семафором.
+    """
+    task = _refreshing.get(user_id)
+
+    if task is None:
+        task = asyncio.create_task(_refresh_spotify_credential(user_id))
+        _refreshing[user_id] = task
+        task.add_done_callback(lambda _: _refreshing.pop(user_id, None))
+
+    return await asyncio.shield(task)
+
+
+async def get_access_token(user_id: int, service: str) -> str | None:
+    """
+    Действующий access token пользователя без обращения к БД.
+
+    Токен Spotify обновляется здесь только если фоновый
+    обновитель не успел сделать это заранее. Пока обновление
+    отложено после ошибки, истёкший токен не возвращается.
+    """
+    credential = credential_cache.get(user_id, service)
+    if not credential:
+        return None
+
+    if service == "spotify" and credential.expires_within(timedelta(0)):
+        if credential_cache.backing_off(user_id, service):
+            return None
+        credential = await refresh_spotify_credential(user_id)
+
+    return credential.access_token if credential else None
+
+
+async def run_token_refresher():
+    """
+    Заранее обновлять токены Spotify, истекающие в ближайшие REFRESH_AHEAD.
+    """
+    logger.info(
+        f"Token refresher started ahead={REFRESH_AHEAD} "
+        f"concurrency={MAX_CONCURRENT_REFRESHES}"
+    )
+
+    while True:
+        user_ids = credential_cache.expiring("spotify", REFRESH_AHEAD)
+
+        results = await asyncio.gather(
+            *(refresh_spotify_credential(user_id) for user_id in user_ids),
+            return_exceptions=True,
+        )
+
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Spotify token refresh failed user_id={user_id}: {result}"
+                )
+
+        await asyncio.sleep(REFRESH_CHECK_INTERVAL)
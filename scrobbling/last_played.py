@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from music.models import UserTrackActivity
+
+
+class LastPlayed(NamedTuple):
+    external_id: str
+    played_at: datetime
+
+
+class LastPlayedIndex:
+    """
+    Индекс последнего прослушивания пользователя в каждом сервисе.
+
+    Хранит (user_id, service) → (external_id, played_at) и позволяет
+    отбрасывать повторные опросы того же трека без запросов к БД.
+    Заполняется одним запросом при старте и обновляется при каждой записи.
+    """
+
+    def __init__(self, entries: dict[tuple[int, str], LastPlayed] | None = None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, user_ids=None) -> "LastPlayedIndex":
+        """
+        Построить индекс по последним записям UserTrackActivity.
+
+        :param user_ids: ограничить индекс этими пользователями
+        """
+        qs = UserTrackActivity.objects.all()
+        if user_ids is not None:
+            qs = qs.filter(user_id__in=user_ids)
+
+        rows = (
+            qs.annotate(
+                rank=Window(
+                    RowNumber(),
+                    partition_by=[F("user_id"), F("track__service")],
+                    order_by=F("played_at").desc(),
+                )
+            )
+            .filter(rank=1)
+            .values_list(
+                "user_id",
+                "track__service",
+                "track__external_id",
+                "played_at",
+            )
+        )
+
+        return cls({
+            (user_id, service): LastPlayed(external_id, played_at)
+            for user_id, service, external_id, played_at in rows
+        })
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, user_id: int, service: str) -> LastPlayed | None:
+        return self.entries.get((user_id, service))
+
+    def record(self, user_id: int, service: str, external_id: str, played_at: datetime) -> bool:
+        """
+        Учесть прослушивание и сообщить, нужно ли его сохранять.
+
+        :return: False, если пользователь всё ещё слушает тот же трек
+        """
+        key = (user_id, service)
+        previous = self.entries.get(key)
+
+        if previous and previous.external_id == external_id:
+            return False
+
+        if not previous or played_at >= previous.played_at:
+            self.entries[key] = LastPlayed(external_id, played_at)
+
+        return True
+
+    def advance(self, user_id: int, service: str, external_id: str, played_at: datetime) -> bool:
+        """
+        Учесть прослушивание с точным временем окончания.
+
+        Используется для истории Spotify, где повтор определяется
+        по played_at, а не по совпадению трека.
+
+        :return: False, если прослушивание не новее уже сохранённого
+        """
+        key = (user_id, service)
+        previous = self.entries.get(key)
+
+        if previous and played_at <= previous.played_at:
+            return False
+
+        self.entries[key] = LastPlayed(external_id, played_at)
+        return True
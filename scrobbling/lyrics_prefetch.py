@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from integrations.cache import TTLCache
+from music.models import Track, UserTrackActivity
+from music.services.lyrics_service import LyricsService
+from music.services.now_playing import fresh_snapshots
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60
+FETCH_INTERVAL = 1
+RECENT_WINDOW = timedelta(hours=24)
+MIN_RECENT_LISTENERS = 2
+NOW_PLAYING_WEIGHT = 10
+BATCH_SIZE = REFRESH_INTERVAL // FETCH_INTERVAL
+ATTEMPT_TTL = 60 * 60
+
+
+def load_prefetch_candidates(limit: int, exclude=()) -> list[Track]:
+    """
+    Треки без сохранённого текста в порядке убывания приоритета.
+
+    Приоритет — число слушателей за RECENT_WINDOW плюс
+    NOW_PLAYING_WEIGHT за каждого, кто слушает трек прямо сейчас.
+    """
+    now = timezone.now()
+    exclude = set(exclude)
+    priorities = Counter()
+
+    recent = (
+        UserTrackActivity.objects
+        .filter(played_at__gte=now - RECENT_WINDOW, track__lyrics__isnull=True)
+        .values("track_id")
+        .annotate(listeners=Count("user_id", distinct=True))
+        .filter(listeners__gte=MIN_RECENT_LISTENERS)
+        .order_by("-listeners")[:limit + len(exclude)]
+    )
+    for row in recent:
+        priorities[row["track_id"]] += row["listeners"]
+
+    playing = Counter(
+        fresh_snapshots()
+        .filter(payload__status="ok")
+        .values_list("service", "payload__track__external_id")
+    )
+
+    if playing:
+        condition = Q()
+        for service, external_id in playing:
+            condition |= Q(service=service, external_id=external_id)
+
+        for track_id, service, external_id in (
+            Track.objects
+            .filter(condition, lyrics__isnull=True)
+            .values_list("id", "service", "external_id")
+        ):
+            priorities[track_id] += NOW_PLAYING_WEIGHT * playing[(service, external_id)]
+
+    track_ids = [
+        track_id
+        for track_id, _ in priorities.most_common()
+        if track_id not in exclude
+    ][:limit]
+
+    tracks = Track.objects.in_bulk(track_ids)
+    return [tracks[track_id] for track_id in track_ids if track_id in tracks]
+
+
+load_prefetch_candidates_async = sync_to_async(load_prefetch_candidates, thread_sensitive=True)
+
+
+class LyricsPrefetcher:
+    """
+    Фоновая загрузка текстов популярных треков.
+
+    Раз в REFRESH_INTERVAL секунд выбирает треки, которые сейчас играют
+    или которые недавно слушали несколько пользователей, и сохраняет
+    их тексты через LyricsService — не чаще одного запроса
+    к провайдерам в FETCH_INTERVAL секунд. Трек, для которого текст
+    не удалось получить, откладывается на ATTEMPT_TTL секунд.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = REFRESH_INTERVAL,
+        fetch_interval: float = FETCH_INTERVAL,
+    ):
+        self.refresh_interval = refresh_interval
+        self.fetch_interval = fetch_interval
+
+        self.service = LyricsService()
+        self.attempted = TTLCache(50_000, ATTEMPT_TTL)
+
+    async def run(self):
+        logger.info(
+            f"Lyrics prefetcher started interval={self.refresh_interval}s "
+            f"rate={1 / self.fetch_interval:.1f}/s"
+        )
+
+        while True:
+            started = asyncio.get_running_loop().time()
+
+            try:
+                await self.prefetch_batch()
+            except Exception:
+                logger.exception("Lyrics prefetch batch failed")
+
+            elapsed = asyncio.get_running_loop().time() - started
+            await asyncio.sleep(max(0, self.refresh_interval - elapsed))
+
+    async def prefetch_batch(self):
+        tracks = await load_prefetch_candidates_async(
+            BATCH_SIZE,
+            exclude=self.attempted.keys(),
+        )
+
+        stored = 0
+        for track in tracks:
+            self.attempted.set(track.id, True)
+            stored += await self.service.prefetch(track)
+            await asyncio.sleep(self.fetch_interval)
+
+        if tracks:
+            logger.debug(f"Lyrics prefetched candidates={len(tracks)} stored={stored}")
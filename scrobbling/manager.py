@@ -1,3 +1,4 @@
+import random
 from math import ceil
 
 MAX_WORKERS = 6
@@ -7,6 +8,15 @@ BASE_INTERVAL = 15
 SPOTIFY_INTERVAL = 300
 USERS_REFRESH_INTERVAL = 60
 
+MIN_POLL_INTERVAL = 5
+MAX_PLAYING_INTERVAL = 180
+TRACK_END_SLACK = 3
+
+YANDEX_MAX_IDLE_INTERVAL = 120
+SPOTIFY_MAX_IDLE_INTERVAL = 1800
+
+MAX_CONCURRENT_POLLS = 100
+
 
 def calculate_workers(users_count: int) -> int:
     required = ceil(users_count / USERS_PER_WORKER)
@@ -19,3 +29,23 @@ def calculate_poll_interval(users_count: int, workers_count: int) -> int:
 
     load_factor = users_count / (workers_count * USERS_PER_WORKER)
     return int(BASE_INTERVAL * max(1, load_factor))
+
+
+def calculate_idle_delay(base_interval: float, idle_streak: int, max_interval: float) -> float:
+    """
+    Экспоненциальная задержка для пользователя, который ничего не слушает.
+    """
+    delay = base_interval * 2 ** max(0, idle_streak - 1)
+    return min(delay, max_interval) * random.uniform(0.9, 1.1)
+
+
+def calculate_playing_delay(remaining_seconds: float, max_interval: float = MAX_PLAYING_INTERVAL) -> float:
+    """
+    Задержка до ожидаемого окончания текущего трека.
+
+    :param max_interval: верхняя граница задержки; для сервисов без
+        позиции воспроизведения — интервал опроса, чтобы не пропускать
+        переключённые и короткие треки
+    """
+    delay = remaining_seconds + TRACK_END_SLACK
+    return max(MIN_POLL_INTERVAL, min(delay, max_interval))
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from music.services.now_playing import save_snapshots_async
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2
+# Запас срока снимка на задержку записи и длительность следующего опроса
+VALID_SLACK = FLUSH_INTERVAL + 10
+
+
+class NowPlayingPublisher:
+    """
+    Публикация снимков «сейчас играет» для веб-интерфейса.
+
+    Воркеры сообщают результат каждого опроса вместе с задержкой
+    до следующего, а в БД раз в FLUSH_INTERVAL секунд одним upsert
+    записывается только последний снимок каждого пользователя.
+    Снимок действителен до следующего опроса плюс VALID_SLACK.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+
+        self.pending: dict[tuple[int, str], tuple[dict, datetime]] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def publish(self, user_id: int, service: str, payload: dict, next_poll_in: float):
+        """
+        :param next_poll_in: через сколько секунд пользователь будет опрошен снова
+        """
+        valid_until = timezone.now() + timedelta(seconds=next_poll_in + VALID_SLACK)
+        self.pending[(user_id, service)] = (payload, valid_until)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+
+        try:
+            await asyncio.shield(save_snapshots_async([
+                (user_id, service, payload, valid_until)
+                for (user_id, service), (payload, valid_until) in batch.items()
+            ]))
+        except Exception:
+            logger.exception(f"Now playing flush failed size={len(batch)}")
+            # Более свежие снимки, пришедшие во время записи, не затираем
+            self.pending = {**batch, **self.pending}
+            return
+
+        logger.debug(f"Now playing snapshots flushed size={len(batch)}")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
@@ -1,43 +1,63 @@
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from asgiref.sync import sync_to_async
-from music.models import Track, UserTrackActivity
-
-
-def save_track_activity(*, user, track_data: dict):
-    track, _ = Track.objects.get_or_create(
-        service=track_data["service"],
-        external_id=track_data["external_id"],
-        defaults={
-            "title": track_data["title"],
-            "artist": track_data["artist"],
-            "track_url": track_data.get("track_url", ""),
-            "cover_url": track_data.get("cover_url", ""),
-            "duration_ms": track_data["duration_ms"],
-            "genre": track_data.get("genre", ""),
-        }
-    )
+from music.models import UserTrackActivity
+from music.services.rollups import add_listening_counters, add_listening_hours
+from music.services.stats_cache import bump_data_versions
+from music.services.track_cache import resolve_track_ids
 
-    last_activity = (
-        UserTrackActivity.objects
-        .filter(user=user, track__service=track.service)
-        .select_related("track")
-        .order_by("-played_at")
-        .first()
-    )
 
-    if last_activity and last_activity.track_id == track.id:
-        return None
+def normalize_played_at(value):
+    if not value:
+        return timezone.now()
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
+
+
+@transaction.atomic
+def insert_track_activities(items: list[tuple[int, dict]]) -> list[UserTrackActivity]:
+    """
+    Записать пачку скробблов за фиксированное число запросов.
+
+    Треки создаются массово, прослушивания вставляются одним bulk_create,
+    почасовые агрегаты, счётчики артистов и жанров и версия данных
+    пользователя обновляются upsert-запросами.
+    Проверка повторов должна быть выполнена заранее.
 
-    played_at = track_data.get("played_at") or timezone.now()
+    :param items: список пар (user_id, track_data)
+    """
+    if not items:
+        return []
 
-    return UserTrackActivity.objects.create(
-        user=user,
-        track=track,
-        played_at=played_at
+    track_ids = resolve_track_ids([data for _, data in items])
+
+    add_listening_counters(
+        (user_id, track_ids[(data["service"], data["external_id"])])
+        for user_id, data in items
+    )
+
+    activities = UserTrackActivity.objects.bulk_create([
+        UserTrackActivity(
+            user_id=user_id,
+            track_id=track_ids[(data["service"], data["external_id"])],
+            played_at=normalize_played_at(data.get("played_at")),
+        )
+        for user_id, data in items
+    ])
+
+    add_listening_hours(
+        (activity.user_id, data["service"], activity.played_at)
+        for activity, (_, data) in zip(activities, items)
     )
 
+    bump_data_versions(user_id for user_id, _ in items)
+
+    return activities
+
 
-save_track_activity_async = sync_to_async(
-    save_track_activity,
+insert_track_activities_async = sync_to_async(
+    insert_track_activities,
     thread_sensitive=True
 )
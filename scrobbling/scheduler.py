@@ -1,81 +1,142 @@
 import asyncio
 import logging
 
-from django.contrib.auth.models import User
 from asgiref.sync import sync_to_async
 
+from integrations.async_http import close_session
+from music.services.lyrics_service import lyrics_providers
+from music.services.track_cache import track_id_cache
+from scrobbling.credentials import run_token_refresher
+from scrobbling.last_played import LastPlayedIndex
+from scrobbling.lyrics_prefetch import LyricsPrefetcher
 from scrobbling.manager import (
     calculate_workers,
     calculate_poll_interval,
     SPOTIFY_INTERVAL,
     USERS_REFRESH_INTERVAL,
 )
+from scrobbling.now_playing import NowPlayingPublisher
+from scrobbling.users import ScrobbleUser, ServiceRegistry, refresh_registry
 from scrobbling.workers.yandex import YandexScrobbleWorker
 from scrobbling.workers.spotify import SpotifyScrobbleWorker
+from scrobbling.writer import ScrobbleWriter
 
 logger = logging.getLogger(__name__)
 
 
-@sync_to_async
-def get_users():
-    return list(User.objects.all())
+class WorkerPool:
+    """
+    Набор воркеров одного сервиса.
 
+    Пользователи добавляются в наименее загруженный воркер и удаляются
+    точечно, поэтому изменение состава не прерывает опрос остальных.
+    Новые воркеры запускаются, когда этого требует calculate_workers.
+    """
 
-def chunk_users(users, chunks_count):
-    size = max(1, len(users) // chunks_count)
-    for i in range(0, len(users), size):
-        yield users[i:i + size]
+    def __init__(self, worker_cls, writer, publisher, fixed_interval: int | None = None):
+        self.worker_cls = worker_cls
+        self.writer = writer
+        self.publisher = publisher
+        self.fixed_interval = fixed_interval
 
+        self.workers = []
+        self.tasks: list[asyncio.Task] = []
+        self.assignments: dict[int, object] = {}
 
-async def start_scrobbling():
-    current_user_ids: set[int] = set()
-    tasks: list[asyncio.Task] = []
+    def __len__(self):
+        return len(self.assignments)
 
-    while True:
-        users = await get_users()
-        user_ids = {u.id for u in users}
+    def poll_interval(self) -> int:
+        if self.fixed_interval is not None:
+            return self.fixed_interval
+        return calculate_poll_interval(len(self), len(self.workers))
 
-        if user_ids != current_user_ids:
-            logger.info(
-                f"Users changed: {len(current_user_ids)} → {len(user_ids)}. "
-                f"Restarting scrobbling workers."
-            )
+    def add(self, user: ScrobbleUser):
+        if user.id in self.assignments:
+            return
 
-            for task in tasks:
-                task.cancel()
-            tasks.clear()
+        if len(self.workers) < calculate_workers(len(self) + 1):
+            worker = self.worker_cls([], self.poll_interval(), self.writer, self.publisher)
+            self.workers.append(worker)
+            self.tasks.append(asyncio.create_task(worker.run()))
+        else:
+            worker = min(self.workers, key=lambda w: len(w.users))
 
-            if users:
-                workers_count = calculate_workers(len(users))
+        worker.add_user(user)
+        self.assignments[user.id] = worker
+        self.update_intervals()
 
-                yandex_interval = calculate_poll_interval(
-                    len(users),
-                    workers_count
-                )
-                spotify_interval = SPOTIFY_INTERVAL
+    def remove(self, user_id: int):
+        worker = self.assignments.pop(user_id, None)
+        if worker is None:
+            return
+
+        worker.remove_user(user_id)
+        self.update_intervals()
+
+    def update_intervals(self):
+        interval = self.poll_interval()
+        for worker in self.workers:
+            worker.poll_interval = interval
 
-                user_chunks = list(
-                    chunk_users(users, workers_count)
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+async def start_scrobbling():
+    index = await sync_to_async(LastPlayedIndex.load)()
+    logger.info(f"Last played index warmed entries={len(index)}")
+
+    writer = ScrobbleWriter(index)
+    writer.start()
+
+    publisher = NowPlayingPublisher()
+    publisher.start()
+
+    refresher = asyncio.create_task(run_token_refresher())
+    prefetcher = asyncio.create_task(LyricsPrefetcher().run())
+
+    try:
+        await run_workers(writer, publisher)
+    finally:
+        refresher.cancel()
+        prefetcher.cancel()
+        await asyncio.gather(refresher, prefetcher, return_exceptions=True)
+        await writer.close()
+        await publisher.close()
+        await close_session()
+
+
+async def run_workers(writer: ScrobbleWriter, publisher: NowPlayingPublisher):
+    registry = ServiceRegistry()
+    pools = {
+        "yandex": WorkerPool(YandexScrobbleWorker, writer, publisher),
+        "spotify": WorkerPool(SpotifyScrobbleWorker, writer, publisher, SPOTIFY_INTERVAL),
+    }
+
+    try:
+        while True:
+            added, removed = await refresh_registry(registry)
+
+            for account in removed:
+                pools[account.service].remove(account.user_id)
+
+            for account in added:
+                pools[account.service].add(ScrobbleUser(account.user_id))
+
+            if added or removed:
+                logger.info(
+                    f"Services changed: +{len(added)} -{len(removed)}. "
+                    f"Yandex users={len(pools['yandex'])} "
+                    f"Spotify users={len(pools['spotify'])}"
                 )
 
-                for chunk in user_chunks:
-                    tasks.append(
-                        asyncio.create_task(
-                            YandexScrobbleWorker(
-                                chunk,
-                                yandex_interval
-                            ).run()
-                        )
-                    )
-                    tasks.append(
-                        asyncio.create_task(
-                            SpotifyScrobbleWorker(
-                                chunk,
-                                spotify_interval
-                            ).run()
-                        )
-                    )
-
-            current_user_ids = user_ids
-
-        await asyncio.sleep(USERS_REFRESH_INTERVAL)
+            logger.debug(f"Track id cache stats: {track_id_cache.stats()}")
+            logger.debug(f"Lyrics providers stats: {lyrics_providers.stats()}")
+
+            await asyncio.sleep(USERS_REFRESH_INTERVAL)
+    finally:
+        for pool in pools.values():
+            await pool.close()
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from spotipy import SpotifyOauthError
+
+from scrobbling import credentials
+from scrobbling.credentials import (
+    REFRESH_AHEAD,
+    REFRESH_BACKOFF,
+    Credential,
+    credential_cache,
+    get_access_token,
+    refresh_spotify_credential,
+)
+
+USER_ID = 1
+
+
+class RevokedTokenTests(SimpleTestCase):
+    def setUp(self):
+        credential_cache.entries.clear()
+        credential_cache.backoff.clear()
+        self.addCleanup(credential_cache.entries.clear)
+        self.addCleanup(credential_cache.backoff.clear)
+
+        self.expired = Credential("access", "revoked", timezone.now() - timedelta(minutes=1))
+        credential_cache.set(USER_ID, "spotify", self.expired)
+
+        patcher = mock.patch.object(
+            credentials,
+            "refresh_access_token",
+            side_effect=SpotifyOauthError("invalid_grant"),
+        )
+        self.refresh = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_failed_refresh_is_not_retried_until_backoff_ends(self):
+        with self.assertRaises(SpotifyOauthError):
+            await refresh_spotify_credential(USER_ID)
+
+        self.assertEqual(credential_cache.expiring("spotify", REFRESH_AHEAD), [])
+        self.assertIsNone(await get_access_token(USER_ID, "spotify"))
+        self.assertEqual(self.refresh.call_count, 1)
+
+        later = timezone.now() + REFRESH_BACKOFF + timedelta(seconds=1)
+        with mock.patch("scrobbling.credentials.timezone.now", return_value=later):
+            self.assertEqual(credential_cache.expiring("spotify", REFRESH_AHEAD), [USER_ID])
+
+    async def test_backoff_grows_with_failures(self):
+        for _ in range(2):
+            with self.assertRaises(SpotifyOauthError):
+                await refresh_spotify_credential(USER_ID)
+
+            # Пауза истекла — следующая попытка снова разрешена
+            failures, _ = credential_cache.backoff[(USER_ID, "spotify")]
+            credential_cache.backoff[(USER_ID, "spotify")] = (failures, timezone.now())
+
+        self.assertEqual(self.refresh.call_count, 2)
+
+        now = timezone.now()
+        retry_at = credential_cache.record_failure(USER_ID, "spotify")
+        self.assertGreaterEqual(retry_at - now, REFRESH_BACKOFF * 4)
+
+    async def test_reconnect_clears_backoff(self):
+        with self.assertRaises(SpotifyOauthError):
+            await refresh_spotify_credential(USER_ID)
+
+        # Повторное чтение той же строки паузу не сбрасывает
+        credential_cache.set(USER_ID, "spotify", self.expired)
+        self.assertTrue(credential_cache.backing_off(USER_ID, "spotify"))
+
+        fresh = Credential("new", "new-refresh", timezone.now() + timedelta(hours=1))
+        credential_cache.set(USER_ID, "spotify", fresh)
+
+        self.assertFalse(credential_cache.backing_off(USER_ID, "spotify"))
+        self.assertEqual(await get_access_token(USER_ID, "spotify"), "new")
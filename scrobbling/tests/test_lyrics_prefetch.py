@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from music.models import NowPlayingSnapshot, Track
+from scrobbling.lyrics_prefetch import load_prefetch_candidates
+
+
+class PrefetchCandidatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.track = Track.objects.create(
+            service="spotify",
+            external_id="track-1",
+            title="Title",
+            artist="Artist",
+            duration_ms=1000,
+        )
+        cls.user = User.objects.create(username="listener")
+
+    def snapshot(self, valid_until):
+        NowPlayingSnapshot.objects.create(
+            user=self.user,
+            service="spotify",
+            payload={"status": "ok", "track": {"external_id": "track-1"}},
+            updated_at=timezone.now() - timedelta(minutes=10),
+            valid_until=valid_until,
+        )
+
+    def test_playing_until_next_poll_is_candidate(self):
+        # Снимок опубликован давно, но следующий опрос ещё не наступил
+        self.snapshot(timezone.now() + timedelta(minutes=5))
+        self.assertEqual(load_prefetch_candidates(10), [self.track])
+
+    def test_expired_snapshot_is_ignored(self):
+        self.snapshot(timezone.now() - timedelta(seconds=1))
+        self.assertEqual(load_prefetch_candidates(10), [])
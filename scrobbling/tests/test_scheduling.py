@@ -0,0 +1,70 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from scrobbling.manager import BASE_INTERVAL, MAX_PLAYING_INTERVAL, TRACK_END_SLACK
+from scrobbling.workers.base import BaseScrobbleWorker, PollResult, PollState
+
+
+class DummyWorker(BaseScrobbleWorker):
+    service = "dummy"
+
+    async def scrobble_user(self, user):
+        return None
+
+
+class NextDelayTests(SimpleTestCase):
+    def setUp(self):
+        self.worker = DummyWorker([], BASE_INTERVAL, writer=None)
+
+    def test_known_progress_waits_for_track_end(self):
+        delay = self.worker.next_delay(
+            PollState(),
+            PollResult(playing=True, external_id="1", duration_ms=120_000, progress_ms=30_000),
+        )
+        self.assertEqual(delay, 90 + TRACK_END_SLACK)
+
+    def test_known_progress_capped(self):
+        delay = self.worker.next_delay(
+            PollState(),
+            PollResult(playing=True, external_id="1", duration_ms=600_000, progress_ms=0),
+        )
+        self.assertEqual(delay, MAX_PLAYING_INTERVAL)
+
+    def test_unknown_progress_capped_by_poll_interval(self):
+        delay = self.worker.next_delay(
+            PollState(),
+            PollResult(playing=True, external_id="1", duration_ms=240_000),
+        )
+        self.assertEqual(delay, BASE_INTERVAL)
+
+    def test_base_worker_requires_scrobble_user(self):
+        with self.assertRaises(TypeError):
+            BaseScrobbleWorker([], BASE_INTERVAL, writer=None)
+
+
+class RunShutdownTests(SimpleTestCase):
+    async def test_run_waits_for_cancelled_polls(self):
+        finished = asyncio.Event()
+
+        class SlowWorker(DummyWorker):
+            async def scrobble_user(self, user):
+                try:
+                    await asyncio.sleep(10)
+                finally:
+                    # Завершение опроса после отмены тоже занимает время
+                    await asyncio.sleep(0.01)
+                    finished.set()
+
+        user = mock.Mock(id=1)
+        worker = SlowWorker([user], poll_interval=0, writer=None)
+
+        task = asyncio.create_task(worker.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertTrue(finished.is_set())
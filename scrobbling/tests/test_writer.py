@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase
+
+from scrobbling.last_played import LastPlayedIndex
+from scrobbling.writer import MAX_ROW_ATTEMPTS, ScrobbleWriter
+
+STARTED_AT = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def make_track(external_id: str, minutes: int = 0) -> dict:
+    return {
+        "service": "yandex",
+        "external_id": external_id,
+        "title": external_id,
+        "artist": "Artist",
+        "duration_ms": 1000,
+        "played_at": STARTED_AT + timedelta(minutes=minutes),
+    }
+
+
+class FakeStorage:
+    """
+    Замена insert_track_activities_async: падает на строках из bad.
+    """
+
+    def __init__(self, bad=(), error=IntegrityError):
+        self.bad = set(bad)
+        self.error = error
+        self.saved = []
+        self.calls = 0
+
+    async def __call__(self, rows):
+        self.calls += 1
+        if any(data["external_id"] in self.bad for _, data in rows):
+            raise self.error("fail")
+        self.saved.extend(data["external_id"] for _, data in rows)
+        return rows
+
+
+class ScrobbleWriterTests(SimpleTestCase):
+    async def add_tracks(self, writer, external_ids, start: int = 0):
+        for minutes, external_id in enumerate(external_ids, start):
+            await writer.add(
+                user_id=1,
+                track_data=make_track(external_id, minutes),
+            )
+
+    async def test_bad_row_does_not_block_batch(self):
+        storage = FakeStorage(bad={"bad"})
+        writer = ScrobbleWriter(LastPlayedIndex())
+
+        with mock.patch("scrobbling.writer.insert_track_activities_async", storage):
+            await self.add_tracks(writer, ["a", "bad", "b"])
+
+            with self.assertLogs("scrobbling.writer", "ERROR"):
+                await writer.flush()
+
+        self.assertEqual(storage.saved, ["a", "b"])
+        self.assertEqual([data["external_id"] for _, data in writer.pending], ["bad"])
+
+    async def test_bad_row_is_dropped_after_max_attempts(self):
+        storage = FakeStorage(bad={"bad"})
+        writer = ScrobbleWriter(LastPlayedIndex())
+
+        with mock.patch("scrobbling.writer.insert_track_activities_async", storage):
+            await self.add_tracks(writer, ["bad"])
+
+            with self.assertLogs("scrobbling.writer", "ERROR"):
+                for _ in range(MAX_ROW_ATTEMPTS):
+                    await writer.flush()
+
+            self.assertEqual(writer.pending, [])
+            self.assertEqual(writer.attempts, {})
+
+            await self.add_tracks(writer, ["c"], start=1)
+            await writer.flush()
+
+        self.assertEqual(storage.saved, ["c"])
+
+    async def test_transient_error_keeps_batch_without_attempts(self):
+        storage = FakeStorage(bad={"a"}, error=OperationalError)
+        writer = ScrobbleWriter(LastPlayedIndex())
+
+        with mock.patch("scrobbling.writer.insert_track_activities_async", storage):
+            await self.add_tracks(writer, ["a", "b"])
+
+            with self.assertLogs("scrobbling.writer", "ERROR"):
+                for _ in range(MAX_ROW_ATTEMPTS + 1):
+                    await writer.flush()
+
+        self.assertEqual([data["external_id"] for _, data in writer.pending], ["a", "b"])
+        self.assertEqual(writer.attempts, {})
+
+    async def test_close_waits_for_in_flight_save(self):
+        release = asyncio.Event()
+        saved = []
+
+        async def slow_save(rows):
+            await release.wait()
+            saved.extend(data["external_id"] for _, data in rows)
+            return rows
+
+        writer = ScrobbleWriter(LastPlayedIndex(), flush_interval=0)
+
+        with mock.patch("scrobbling.writer.insert_track_activities_async", slow_save):
+            await self.add_tracks(writer, ["a"])
+            writer.start()
+            await asyncio.sleep(0.01)
+
+            closing = asyncio.create_task(writer.close())
+            await asyncio.sleep(0.01)
+            self.assertFalse(closing.done())
+
+            release.set()
+            await closing
+
+        self.assertEqual(saved, ["a"])
+        self.assertEqual(writer.pending, [])
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from integrations.yandex.async_api import TrackBatchLoader
+from integrations.yandex.tracks import track_cache
+
+
+class FakeYandexAPI:
+    """
+    Замена AsyncYandexMusicAPI: токен видит только треки из visible.
+    """
+
+    visible: dict[str, set[str]] = {}
+    calls: list[tuple[str, list]] = []
+
+    def __init__(self, token: str):
+        self.token = token
+
+    async def get_tracks(self, track_ids: list) -> list:
+        self.calls.append((self.token, sorted(track_ids)))
+        return [
+            SimpleNamespace(id=track_id)
+            for track_id in track_ids
+            if track_id in self.visible.get(self.token, set())
+        ]
+
+
+class TrackBatchLoaderTests(SimpleTestCase):
+    def setUp(self):
+        track_cache.clear()
+        FakeYandexAPI.calls = []
+
+    async def load_all(self, requests):
+        loader = TrackBatchLoader(window=0.01)
+
+        with mock.patch("integrations.yandex.async_api.AsyncYandexMusicAPI", FakeYandexAPI):
+            return await asyncio.gather(*(
+                loader.load(track_id, token) for track_id, token in requests
+            ))
+
+    async def test_shared_batch_uses_one_request(self):
+        FakeYandexAPI.visible = {"a": {"1", "2"}, "b": {"1", "2"}}
+
+        tracks = await self.load_all([("1", "a"), ("2", "b"), ("1", "b")])
+
+        self.assertEqual([track.id for track in tracks], ["1", "2", "1"])
+        self.assertEqual(len(FakeYandexAPI.calls), 1)
+
+    async def test_missing_tracks_retried_with_callers_token(self):
+        # Токен a истёк, трек 2 виден только владельцу токена b
+        FakeYandexAPI.visible = {"b": {"2"}, "c": {"1"}}
+
+        tracks = await self.load_all([("1", "a"), ("1", "c"), ("2", "b"), ("2", "a")])
+
+        self.assertEqual([track.id for track in tracks], ["1", "1", "2", "2"])
+        self.assertEqual(FakeYandexAPI.calls[0], ("a", ["1", "2"]))
+
+    async def test_not_found_for_any_token(self):
+        FakeYandexAPI.visible = {}
+
+        tracks = await self.load_all([("1", "a"), ("1", "b")])
+
+        self.assertEqual(tracks, [None, None])
+        self.assertEqual(len(FakeYandexAPI.calls), 2)
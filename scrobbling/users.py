@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+
+from music.models import UserMusicService
+from scrobbling.credentials import Credential, credential_cache
+
+
+class ScrobbleUser(NamedTuple):
+    """
+    Компактная запись пользователя для воркеров скробблинга.
+    """
+    id: int
+
+
+class ServiceAccount(NamedTuple):
+    user_id: int
+    service: str
+
+
+class ServiceRegistry:
+    """
+    Набор подключённых музыкальных сервисов, отслеживаемых скробблером.
+
+    Вместо загрузки всех пользователей на каждом обновлении читаются
+    только строки UserMusicService, изменённые после водяного знака
+    updated_at. Удаления обнаруживаются по расхождению количества
+    строк, и только тогда загружается полный список идентификаторов.
+
+    Токены изменённых строк сразу попадают в credential_cache.
+    """
+
+    def __init__(self):
+        self.accounts: dict[int, ServiceAccount] = {}
+        self.watermark: datetime | None = None
+
+    def refresh(self) -> tuple[list[ServiceAccount], list[ServiceAccount]]:
+        """
+        Синхронизировать реестр с БД.
+
+        :return: пары списков (добавленные, удалённые) подключений
+        """
+        qs = UserMusicService.objects.all()
+        if self.watermark:
+            qs = qs.filter(updated_at__gte=self.watermark)
+
+        rows = qs.values_list(
+            "id",
+            "user_id",
+            "service",
+            "updated_at",
+            "access_token",
+            "refresh_token",
+            "expires_at",
+        )
+
+        added = []
+        for row_id, user_id, service, updated_at, *tokens in rows:
+            account = ServiceAccount(user_id, service)
+            credential_cache.set(user_id, service, Credential(*tokens))
+
+            if self.accounts.get(row_id) != account:
+                self.accounts[row_id] = account
+                added.append(account)
+
+            if not self.watermark or updated_at > self.watermark:
+                self.watermark = updated_at
+
+        removed = []
+        if UserMusicService.objects.count() != len(self.accounts):
+            existing = set(UserMusicService.objects.values_list("id", flat=True))
+
+            for row_id in set(self.accounts) - existing:
+                account = self.accounts.pop(row_id)
+                credential_cache.discard(account.user_id, account.service)
+                removed.append(account)
+
+        return added, removed
+
+
+refresh_registry = sync_to_async(ServiceRegistry.refresh)
@@ -0,0 +1,222 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from scrobbling.manager import (
+    calculate_idle_delay,
+    calculate_playing_delay,
+    MAX_CONCURRENT_POLLS,
+    MAX_PLAYING_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PollResult(NamedTuple):
+    """
+    Результат опроса пользователя, по которому планируется следующий опрос.
+
+    duration_ms задаётся, если известен текущий трек; progress_ms —
+    если сервис сообщает позицию воспроизведения. now_playing —
+    снимок для веб-интерфейса, публикуется вместе со сроком
+    до следующего опроса.
+    """
+    playing: bool
+    external_id: str | None = None
+    duration_ms: int | None = None
+    progress_ms: int | None = None
+    now_playing: dict | None = None
+
+
+@dataclass
+class PollState:
+    idle_streak: int = 0
+    external_id: str | None = None
+    started_at: float = 0.0
+
+
+class BaseScrobbleWorker(ABC):
+    """
+    Базовый воркер скробблинга одного музыкального сервиса.
+
+    Пользователи хранятся в очереди с приоритетом по времени следующего
+    опроса. Время выбирается по состоянию пользователя: во время
+    воспроизведения — к ожидаемому концу трека (если сервис не сообщает
+    позицию, то не реже poll_interval), при простое —
+    с экспоненциальной задержкой от poll_interval. Первый опрос новых
+    пользователей распределяется случайно в пределах poll_interval.
+
+    Состав пользователей и интервал меняются на лету планировщиком
+    без перезапуска воркера. Результат опроса публикуется как снимок
+    «сейчас играет» через publisher, если он задан, со сроком
+    действия до следующего опроса.
+    """
+
+    service: str = ""
+    max_idle_interval: float = 600
+
+    def __init__(self, users, poll_interval: int, writer, publisher=None):
+        self.poll_interval = poll_interval
+        self.writer = writer
+        self.publisher = publisher
+
+        self.users = {}
+        self.states: dict[int, PollState] = {}
+        self.deadlines: dict[int, float] = {}
+        self.queue: list[tuple[float, int]] = []
+
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self._polls: set[asyncio.Task] = set()
+
+        for user in users:
+            self.add_user(user)
+
+    def add_user(self, user):
+        if user.id in self.users:
+            return
+
+        self.users[user.id] = user
+        self.states[user.id] = PollState()
+        self.schedule(user.id, random.uniform(0, self.poll_interval))
+
+    def remove_user(self, user_id: int):
+        self.users.pop(user_id, None)
+        self.states.pop(user_id, None)
+        self.deadlines.pop(user_id, None)
+
+    def schedule(self, user_id: int, delay: float):
+        deadline = time.monotonic() + delay
+        self.deadlines[user_id] = deadline
+        heapq.heappush(self.queue, (deadline, user_id))
+        self._wakeup.set()
+
+    def pop_due(self) -> list[int]:
+        now = time.monotonic()
+        due = []
+
+        while self.queue and self.queue[0][0] <= now:
+            deadline, user_id = heapq.heappop(self.queue)
+
+            # Устаревшие записи (пользователь удалён или перепланирован)
+            if self.deadlines.get(user_id) != deadline:
+                continue
+
+            del self.deadlines[user_id]
+            due.append(user_id)
+
+        return due
+
+    def next_delay(self, state: PollState, result: PollResult | None) -> float:
+        if result is None or not result.playing:
+            state.idle_streak += 1
+            state.external_id = None
+            return calculate_idle_delay(
+                self.poll_interval,
+                state.idle_streak,
+                self.max_idle_interval,
+            )
+
+        state.idle_streak = 0
+
+        if result.duration_ms is None:
+            return self.poll_interval
+
+        now = time.monotonic()
+
+        if result.progress_ms is not None:
+            remaining = (result.duration_ms - result.progress_ms) / 1000
+            max_interval = MAX_PLAYING_INTERVAL
+        else:
+            # Позиция неизвестна: трек мог начаться задолго до первого
+            # опроса или быть пропущен, поэтому опрашиваем как раньше
+            if result.external_id != state.external_id:
+                state.external_id = result.external_id
+                state.started_at = now
+            remaining = state.started_at + result.duration_ms / 1000 - now
+            max_interval = self.poll_interval
+
+        if remaining <= 0:
+            # Трек должен был закончиться: пауза или повтор
+            state.idle_streak += 1
+            return calculate_idle_delay(
+                self.poll_interval,
+                state.idle_streak,
+                self.max_idle_interval,
+            )
+
+        return calculate_playing_delay(remaining, max_interval)
+
+    async def run(self):
+        logger.info(
+            f"{self.service} worker started users={len(self.users)} "
+            f"interval={self.poll_interval}s"
+        )
+
+        try:
+            while True:
+                self._wakeup.clear()
+
+                for user_id in self.pop_due():
+                    task = asyncio.create_task(self.poll(user_id))
+                    self._polls.add(task)
+                    task.add_done_callback(self._polls.discard)
+
+                timeout = (
+                    max(0, self.queue[0][0] - time.monotonic())
+                    if self.queue else None
+                )
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            polls = list(self._polls)
+            for task in polls:
+                task.cancel()
+            await asyncio.gather(*polls, return_exceptions=True)
+
+    async def poll(self, user_id: int):
+        user = self.users.get(user_id)
+        if user is None:
+            return
+
+        async with self._semaphore:
+            result = await self.scrobble_user_safe(user)
+
+        state = self.states.get(user_id)
+        if state is None:
+            return
+
+        delay = self.next_delay(state, result)
+        self.schedule(user_id, delay)
+
+        if result is not None and result.now_playing is not None:
+            self.publish_now_playing(user, result.now_playing, delay)
+
+    async def scrobble_user_safe(self, user) -> PollResult | None:
+        try:
+            return await self.scrobble_user(user)
+        except Exception:
+            logger.exception(
+                f"{self.service} scrobble failed user_id={user.id}"
+            )
+            return None
+
+    def publish_now_playing(self, user, payload: dict, next_poll_in: float):
+        if self.publisher is not None:
+            self.publisher.publish(user.id, self.service, payload, next_poll_in)
+
+    @abstractmethod
+    async def scrobble_user(self, user) -> PollResult | None:
+        """
+        Опросить сервис и сохранить новые прослушивания пользователя.
+
+        :return: состояние воспроизведения или None, если опрос не удался
+        """
@@ -1,40 +1,34 @@
-import asyncio
 import logging
 
-from scrobbling.adapters.spotify import get_recent_tracks
-from scrobbling.persistence import save_track_activity, save_track_activity_async
+from music.services.now_playing import format_spotify_track
+from scrobbling.adapters.spotify import get_current_track, get_recent_tracks
+from scrobbling.manager import SPOTIFY_MAX_IDLE_INTERVAL
+from scrobbling.workers.base import BaseScrobbleWorker, PollResult
 
 logger = logging.getLogger(__name__)
 
 
-class SpotifyScrobbleWorker:
-    def __init__(self, users, poll_interval: int):
-        self.users = users
-        self.poll_interval = poll_interval
-
-    async def run(self):
-        logger.info(
-            f"Spotify worker started users={len(self.users)} "
-            f"interval={self.poll_interval}s"
-        )
-
-        while True:
-            for user in self.users:
-                try:
-                    await self.scrobble_user(user)
-                except Exception:
-                    logger.exception(
-                        f"Spotify scrobble failed user_id={user.id}"
-                    )
-
-            await asyncio.sleep(self.poll_interval)
+class SpotifyScrobbleWorker(BaseScrobbleWorker):
+    service = "spotify"
+    max_idle_interval = SPOTIFY_MAX_IDLE_INTERVAL
 
     async def scrobble_user(self, user):
-        tracks = await get_recent_tracks(user)
-
+        # Сбой «сейчас играет» не должен мешать скробблингу истории
+        try:
+            current = await get_current_track(user)
+        except Exception:
+            logger.exception(f"spotify now playing failed user_id={user.id}")
+            current = now_playing = None
+        else:
+            now_playing = format_spotify_track(current)
+
+        last = self.writer.index.get(user.id, "spotify")
+        tracks = await get_recent_tracks(user, after=last.played_at if last else None)
+
+        new_plays = 0
         for t in tracks:
-            await save_track_activity_async(
-                user=user,
+            new_plays += await self.writer.add(
+                user_id=user.id,
                 track_data={
                     "service": "spotify",
                     "external_id": t["external_id"],
@@ -43,6 +37,17 @@ class SpotifyScrobbleWorker:
                     "duration_ms": t["duration_ms"],
                     "cover_url": t["cover_url"],
                     "played_at": t["played_at"],
-                }
+                },
+                dedupe_by_played_at=True,
+            )
+
+        if current and current["is_playing"]:
+            return PollResult(
+                playing=True,
+                external_id=current["external_id"],
+                duration_ms=current["duration_ms"],
+                progress_ms=current["progress_ms"],
+                now_playing=now_playing,
             )
 
+        return PollResult(playing=new_plays > 0, now_playing=now_playing)
@@ -1,57 +1,24 @@
-import asyncio
-import logging
-import random
-
-from asgiref.sync import sync_to_async
-
-from music.models import UserMusicService
+from music.services.now_playing import format_yandex_track
 from scrobbling.adapters.yandex import get_current_track
-from scrobbling.persistence import save_track_activity_async
-
-logger = logging.getLogger(__name__)
-
-
-@sync_to_async
-def get_yandex_token(user):
-    service = UserMusicService.objects.filter(
-        user=user,
-        service="yandex"
-    ).first()
-    return service.access_token if service else None
-
+from scrobbling.credentials import get_access_token
+from scrobbling.manager import YANDEX_MAX_IDLE_INTERVAL
+from scrobbling.workers.base import BaseScrobbleWorker, PollResult
 
-class YandexScrobbleWorker:
-    def __init__(self, users, poll_interval: int):
-        self.users = users
-        self.poll_interval = poll_interval
 
-    async def run(self):
-        logger.info(
-            f"Yandex worker started users={len(self.users)} "
-            f"interval={self.poll_interval}s"
-        )
-
-        while True:
-            for user in self.users:
-                try:
-                    await self.scrobble_user(user)
-                except Exception:
-                    logger.exception(
-                        f"Yandex scrobble failed user_id={user.id}"
-                    )
-
-            await asyncio.sleep(
-                self.poll_interval + random.uniform(-2, 2)
-            )
+class YandexScrobbleWorker(BaseScrobbleWorker):
+    service = "yandex"
+    max_idle_interval = YANDEX_MAX_IDLE_INTERVAL
 
     async def scrobble_user(self, user):
-        token = await get_yandex_token(user)
+        token = await get_access_token(user.id, "yandex")
         if not token:
-            return
+            return None
 
         track = await get_current_track(token)
+        now_playing = format_yandex_track(track)
+
         if not track:
-            return
+            return PollResult(playing=False, now_playing=now_playing)
 
         track_data = {
             "service": "yandex",
@@ -68,4 +35,11 @@ class YandexScrobbleWorker:
             ),
         }
 
-        await save_track_activity_async(user=user, track_data=track_data)
+        await self.writer.add(user_id=user.id, track_data=track_data)
+
+        return PollResult(
+            playing=True,
+            external_id=track_data["external_id"],
+            duration_ms=track.duration_ms,
+            now_playing=now_playing,
+        )
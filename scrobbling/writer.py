@@ -0,0 +1,221 @@
+import asyncio
+import logging
+
+from django.db import InterfaceError, OperationalError
+
+from scrobbling.last_played import LastPlayedIndex
+from scrobbling.persistence import insert_track_activities_async, normalize_played_at
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2
+MAX_PENDING = 50_000
+MAX_ROW_ATTEMPTS = 3
+
+# Ошибки соединения с БД: пачка возвращается в буфер целиком
+# и попытки строк не расходуются
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+class ScrobbleWriter:
+    """
+    Буфер отложенной записи скробблов.
+
+    Воркеры складывают нормализованные треки в буфер, а запись в БД
+    выполняется пачками: по достижении BATCH_SIZE или раз
+    в FLUSH_INTERVAL секунд. При остановке сервиса буфер
+    дописывается до конца через close().
+
+    Повторы текущего трека отсекаются по LastPlayedIndex ещё до
+    постановки в буфер, поэтому такие опросы не обращаются к БД.
+
+    Пачка, упавшая не из-за соединения с БД, повторяется по одной
+    строке: удачные строки записываются, неудачные откладываются
+    до следующего flush и после MAX_ROW_ATTEMPTS попыток
+    отбрасываются с записью в лог, чтобы одна битая строка
+    не блокировала остальные скробблы.
+    """
+
+    def __init__(
+        self,
+        index: LastPlayedIndex,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.pending: list[tuple[int, dict]] = []
+        self.attempts: dict[tuple, int] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._in_flight: tuple[asyncio.Future, list[tuple[int, dict]]] | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def add(
+        self,
+        *,
+        user_id: int,
+        track_data: dict,
+        dedupe_by_played_at: bool = False,
+    ) -> bool:
+        """
+        Поставить скроббл в очередь на запись.
+
+        :param dedupe_by_played_at: отсекать повторы по played_at
+            (для истории с точным временем), а не по совпадению трека
+        :return: False, если скроббл уже учтён
+        """
+        played_at = normalize_played_at(track_data.get("played_at"))
+        accept = self.index.advance if dedupe_by_played_at else self.index.record
+
+        if not accept(
+            user_id,
+            track_data["service"],
+            track_data["external_id"],
+            played_at,
+        ):
+            return False
+
+        self.pending.append((user_id, {**track_data, "played_at": played_at}))
+
+        if len(self.pending) >= MAX_PENDING:
+            await self.flush()
+        elif len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+        return True
+
+    async def run(self):
+        logger.info(
+            f"Scrobble writer started batch={self.batch_size} "
+            f"interval={self.flush_interval}s"
+        )
+
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            retry = []
+
+            try:
+                while self.pending:
+                    batch = self.pending[:self.batch_size]
+                    del self.pending[:self.batch_size]
+
+                    try:
+                        created = await self._save(batch)
+                    except TRANSIENT_ERRORS:
+                        logger.exception(
+                            f"Scrobble batch failed size={len(batch)}"
+                        )
+                        self.pending[:0] = batch
+                        return
+                    except Exception:
+                        logger.exception(
+                            f"Scrobble batch failed size={len(batch)}, "
+                            f"retrying row by row"
+                        )
+                        retry += await self._save_rows(batch)
+                        continue
+
+                    logger.debug(
+                        f"Scrobble batch flushed size={len(batch)} "
+                        f"created={len(created)}"
+                    )
+            except TRANSIENT_ERRORS:
+                logger.exception("Scrobble row retry interrupted")
+            finally:
+                self.pending.extend(retry)
+
+    async def _save(self, rows: list[tuple[int, dict]]) -> list:
+        save = asyncio.ensure_future(insert_track_activities_async(rows))
+        self._in_flight = (save, rows)
+
+        try:
+            return await asyncio.shield(save)
+        finally:
+            # При отмене запись продолжается в потоке — её дождётся close()
+            if save.done():
+                self._in_flight = None
+
+    async def _save_rows(self, batch: list[tuple[int, dict]]) -> list[tuple[int, dict]]:
+        """
+        Записать пачку по одной строке.
+
+        :return: строки для повтора в следующем flush
+        :raises OperationalError, InterfaceError: при потере соединения;
+            незаписанные строки возвращаются в начало буфера
+        """
+        retry = []
+
+        for position, row in enumerate(batch):
+            key = self._row_key(row)
+
+            try:
+                await self._save([row])
+            except TRANSIENT_ERRORS:
+                self.pending[:0] = batch[position:]
+                self.pending.extend(retry)
+                retry.clear()
+                raise
+            except asyncio.CancelledError:
+                self.pending[:0] = batch[position + 1:]
+                self.pending.extend(retry)
+                raise
+            except Exception:
+                attempts = self.attempts.get(key, 0) + 1
+
+                if attempts >= MAX_ROW_ATTEMPTS:
+                    self.attempts.pop(key, None)
+                    logger.exception(
+                        f"Scrobble dropped after {attempts} attempts "
+                        f"user={row[0]} track={row[1]!r}"
+                    )
+                else:
+                    self.attempts[key] = attempts
+                    retry.append(row)
+            else:
+                self.attempts.pop(key, None)
+
+        return retry
+
+    @staticmethod
+    def _row_key(row: tuple[int, dict]) -> tuple:
+        user_id, data = row
+        return user_id, data["service"], data["external_id"], data["played_at"]
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._in_flight:
+            save, rows = self._in_flight
+            self._in_flight = None
+
+            try:
+                await save
+            except Exception:
+                self.pending[:0] = rows
+
+        await self.flush()